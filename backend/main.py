@@ -62,7 +62,8 @@ async def process_file(
         }
         
         loading_service = LoadingService()
-        raw_text = loading_service.load_pdf(temp_path, loading_method)
+        # 分块只依赖页面映射，无需拼接全文
+        raw_text = loading_service.load_pdf(temp_path, loading_method, return_text=False)
         metadata["total_pages"] = loading_service.get_total_pages()
         
         page_map = loading_service.get_page_map()
@@ -253,7 +254,11 @@ async def index_embeddings(data: dict):
         if not os.path.exists(embedding_file):
             raise FileNotFoundError(f"Embedding file not found: {file_id}")
             
-        config = VectorDBConfig(provider=vector_db, index_mode=index_mode)
+        config = VectorDBConfig(
+            provider=vector_db,
+            index_mode=index_mode,
+            vector_precision=data.get("vectorPrecision", "fp32")
+        )
         vector_store_service = VectorStoreService()
         result = vector_store_service.index_embeddings(embedding_file, config)
         
@@ -639,7 +644,8 @@ async def load_file(
             loading_method, 
             strategy=strategy,
             chunking_strategy=chunking_strategy,
-            chunking_options=chunking_options_dict
+            chunking_options=chunking_options_dict,
+            return_text=False
         )
         
         metadata["total_pages"] = loading_service.get_total_pages()
@@ -1,19 +1,33 @@
+from array import array
 from datetime import datetime
 import logging
-from typing import List, Dict, Any, Optional, Literal
-from dataclasses import dataclass, asdict
+import re
+from typing import List, Dict, Any, Optional, Literal, Tuple, Union
+from dataclasses import dataclass
 from langchain.text_splitter import RecursiveCharacterTextSplitter
+try:
+    # Rust 实现的文本分割器，按句子分块时显式选择 splitter="native" 才使用
+    from semantic_text_splitter import TextSplitter as NativeTextSplitter
+except ImportError:
+    NativeTextSplitter = None
 
 logger = logging.getLogger(__name__)
 
+# 匹配单个"词"（连续非空白字符），用于按偏移切片而不物化词列表
+_WORD_RE = re.compile(r'\S+')
+
+# 匹配一个段落：从首个非空白字符开始，直到遇到连续两个换行
+_PARA_RE = re.compile(r'\S(?:[^\n]|\n(?!\n))*')
+
 # ===================== 数据模型定义 =====================
-@dataclass
+# 使用 slots 去掉每个实例的 __dict__；均为不可变对象
+@dataclass(slots=True, frozen=True)
 class PageData:
     """页面数据模型"""
     page: int
     text: str
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class ChunkMetadata:
     """分块元数据模型"""
     chunk_id: int
@@ -21,13 +35,13 @@ class ChunkMetadata:
     page_range: str
     word_count: int
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class Chunk:
     """分块数据模型"""
     content: str
     metadata: ChunkMetadata
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class ChunkingResult:
     """分块结果模型"""
     filename: str
@@ -38,6 +52,26 @@ class ChunkingResult:
     timestamp: str
     chunks: List[Chunk]
 
+@dataclass(slots=True, frozen=True)
+class ChunkingResultSoA:
+    """
+    分块结果模型（列式存储）
+
+    块内容与各元数据字段分别存放，整数字段使用连续的 array('i')，
+    适合下游按字段批量遍历（如构建嵌入批次）的大文档场景。
+    page_range 与 page_number 一致，不单独存储。
+    """
+    filename: str
+    total_chunks: int
+    total_pages: int
+    loading_method: str
+    chunking_method: str
+    timestamp: str
+    contents: List[str]
+    chunk_ids: array
+    page_numbers: array
+    word_counts: array
+
 # ===================== 分块策略接口 =====================
 class ChunkingStrategy:
     """分块策略基类"""
@@ -54,6 +88,24 @@ class ChunkingStrategy:
             分块列表
         """
         raise NotImplementedError
+    
+    def chunk_pages(self, pages: List[PageData], start_chunk_id: int) -> List[Chunk]:
+        """
+        分块多个页面，块ID在页面之间连续编号
+
+        默认逐页调用 chunk_page，可支持批量处理的策略可覆盖此方法。
+        
+        Args:
+            pages: 页面数据列表
+            start_chunk_id: 起始块ID
+            
+        Returns:
+            分块列表
+        """
+        chunks = []
+        for page_data in pages:
+            chunks.extend(self.chunk_page(page_data, start_chunk_id + len(chunks)))
+        return chunks
 
 class PageChunkingStrategy(ChunkingStrategy):
     """按页面分块策略"""
@@ -74,53 +126,79 @@ class FixedSizeChunkingStrategy(ChunkingStrategy):
     
     def __init__(self, chunk_size: int = 1000):
         self.chunk_size = chunk_size
+        self._split = self._build_splitter(chunk_size)
     
     def chunk_page(self, page_data: PageData, start_chunk_id: int) -> List[Chunk]:
         chunks = []
         page_chunks = self._create_fixed_size_chunks(page_data.text)
         
-        for idx, chunk_text in enumerate(page_chunks, 1):
+        for chunk_text, word_count in page_chunks:
             metadata = ChunkMetadata(
                 chunk_id=start_chunk_id + len(chunks),
                 page_number=page_data.page,
                 page_range=str(page_data.page),
-                word_count=len(chunk_text.split())
+                word_count=word_count
             )
             chunks.append(Chunk(content=chunk_text, metadata=metadata))
         
         return chunks
     
-    def _create_fixed_size_chunks(self, text: str) -> List[str]:
-        """创建固定大小的文本块"""
-        words = text.split()
-        chunks = []
-        current_chunk = []
-        current_length = 0
+    def _create_fixed_size_chunks(self, text: str) -> List[Tuple[str, int]]:
+        """
+        创建固定大小的文本块，返回 (块文本, 词数) 列表
+
+        通过词边界偏移直接对原文切片，不再构建词列表再 join
+        """
+        return self._split(text)
+    
+    @staticmethod
+    def _build_splitter(chunk_size: int):
+        """
+        生成绑定了 chunk_size 的切分函数
+
+        chunk_size 在策略生命周期内不变，作为闭包变量读取，
+        避免内层循环每次迭代都查找 self.chunk_size
+        """
+        finditer = _WORD_RE.finditer
         
-        for word in words:
-            word_length = len(word) + (1 if current_length > 0 else 0)
+        def split(text: str) -> List[Tuple[str, int]]:
+            chunks = []
+            chunk_start = 0
+            chunk_end = 0
+            current_length = 0
+            current_word_count = 0
             
-            if current_length + word_length > self.chunk_size and current_chunk:
-                chunks.append(" ".join(current_chunk))
-                current_chunk = []
-                current_length = 0
+            for match in finditer(text):
+                start, end = match.span()
+                word_length = end - start + (1 if current_length > 0 else 0)
+                
+                if current_length + word_length > chunk_size and current_word_count:
+                    chunks.append((text[chunk_start:chunk_end], current_word_count))
+                    current_length = 0
+                    current_word_count = 0
+                
+                if current_word_count == 0:
+                    chunk_start = start
+                chunk_end = end
+                current_length += word_length
+                current_word_count += 1
             
-            current_chunk.append(word)
-            current_length += word_length
-        
-        if current_chunk:
-            chunks.append(" ".join(current_chunk))
+            if current_word_count:
+                chunks.append((text[chunk_start:chunk_end], current_word_count))
+            
+            return chunks
         
-        return chunks
+        return split
 
 class ParagraphChunkingStrategy(ChunkingStrategy):
     """按段落分块策略"""
     
     def chunk_page(self, page_data: PageData, start_chunk_id: int) -> List[Chunk]:
         chunks = []
-        paragraphs = [p.strip() for p in page_data.text.split('\n\n') if p.strip()]
         
-        for para in paragraphs:
+        # 单次正则扫描得到段落，空段落天然被跳过
+        for match in _PARA_RE.finditer(page_data.text):
+            para = match.group().rstrip()
             metadata = ChunkMetadata(
                 chunk_id=start_chunk_id + len(chunks),
                 page_number=page_data.page,
@@ -132,18 +210,42 @@ class ParagraphChunkingStrategy(ChunkingStrategy):
         return chunks
 
 class SentenceChunkingStrategy(ChunkingStrategy):
-    """按句子分块策略"""
+    """
+    按句子分块策略
+
+    splitter 决定分块边界，两者结果不同，需显式选择：
+    "langchain"（默认）按 [".", "!", "?", "\n", " "] 递归切分；
+    "native" 使用 semantic-text-splitter（Rust），按 Unicode 句子/单词边界切分，速度更快
+    """
     
-    def __init__(self):
+    def __init__(self, chunk_size: int = 1000, overlap: int = 200,
+                 splitter: Literal["langchain", "native"] = "langchain"):
+        if splitter not in ("langchain", "native"):
+            raise ValueError(f"Unsupported sentence splitter: {splitter}")
+        if splitter == "native" and NativeTextSplitter is None:
+            raise ValueError("Sentence splitter 'native' requires the semantic-text-splitter package")
+        self.chunk_size = chunk_size
+        self.overlap = overlap
+        self.native_splitter = (
+            NativeTextSplitter(chunk_size, overlap=overlap)
+            if splitter == "native" else None
+        )
         self.splitter = RecursiveCharacterTextSplitter(
-            chunk_size=1000,
-            chunk_overlap=200,
+            chunk_size=chunk_size,
+            chunk_overlap=overlap,
             separators=[".", "!", "?", "\n", " "]
         )
+        logger.info(f"Sentence chunking uses the {splitter} splitter (chunk_size={chunk_size}, overlap={overlap})")
+    
+    def _split_text(self, text: str) -> List[str]:
+        """切分单页文本，优先走原生分割器"""
+        if self.native_splitter is not None:
+            return self.native_splitter.chunks(text)
+        return self.splitter.split_text(text)
     
     def chunk_page(self, page_data: PageData, start_chunk_id: int) -> List[Chunk]:
         chunks = []
-        sentences = self.splitter.split_text(page_data.text)
+        sentences = self._split_text(page_data.text)
         
         for sentence in sentences:
             metadata = ChunkMetadata(
@@ -155,30 +257,66 @@ class SentenceChunkingStrategy(ChunkingStrategy):
             chunks.append(Chunk(content=sentence, metadata=metadata))
         
         return chunks
+    
+    def chunk_pages(self, pages: List[PageData], start_chunk_id: int) -> List[Chunk]:
+        """一次性将所有页面交给分割器，页码通过 Document 元数据带回"""
+        if self.native_splitter is not None:
+            # 原生分割器单次调用开销很小，逐页处理即可
+            return super().chunk_pages(pages, start_chunk_id)
+        
+        documents = self.splitter.create_documents(
+            [page_data.text for page_data in pages],
+            metadatas=[{"page": page_data.page} for page_data in pages]
+        )
+        
+        chunks = []
+        for chunk_id, doc in enumerate(documents, start_chunk_id):
+            page = doc.metadata["page"]
+            metadata = ChunkMetadata(
+                chunk_id=chunk_id,
+                page_number=page,
+                page_range=str(page),
+                word_count=len(doc.page_content.split())
+            )
+            chunks.append(Chunk(content=doc.page_content, metadata=metadata))
+        
+        return chunks
 
 # ===================== 策略工厂 =====================
 class ChunkingStrategyFactory:
-    """分块策略工厂"""
+    """
+    分块策略工厂
+
+    策略实例在分块调用之间不保存状态，因此按 (方法, 参数) 缓存复用，
+    避免每次请求都重新构建 LangChain 分割器。
+    """
     
-    @staticmethod
+    _strategies = {
+        "by_pages": PageChunkingStrategy,
+        "fixed_size": FixedSizeChunkingStrategy,
+        "by_paragraphs": ParagraphChunkingStrategy,
+        "by_sentences": SentenceChunkingStrategy,
+    }
+    _cache: Dict[tuple, ChunkingStrategy] = {}
+    
+    @classmethod
     def create_strategy(
+        cls,
         method: Literal["by_pages", "fixed_size", "by_paragraphs", "by_sentences"],
         **kwargs
     ) -> ChunkingStrategy:
-        """创建分块策略实例"""
+        """创建（或复用已缓存的）分块策略实例"""
         
-        strategies = {
-            "by_pages": PageChunkingStrategy,
-            "fixed_size": FixedSizeChunkingStrategy,
-            "by_paragraphs": ParagraphChunkingStrategy,
-            "by_sentences": SentenceChunkingStrategy,
-        }
-        
-        if method not in strategies:
+        if method not in cls._strategies:
             raise ValueError(f"Unsupported chunking method: {method}")
         
-        strategy_class = strategies[method]
-        return strategy_class(**kwargs) if kwargs else strategy_class()
+        key = (method, frozenset(kwargs.items()))
+        strategy = cls._cache.get(key)
+        if strategy is None:
+            strategy_class = cls._strategies[method]
+            strategy = strategy_class(**kwargs) if kwargs else strategy_class()
+            cls._cache[key] = strategy
+        return strategy
 
 # ===================== 主服务类 =====================
 class ChunkingService:
@@ -188,6 +326,11 @@ class ChunkingService:
     
     def __init__(self):
         self.strategy_factory = ChunkingStrategyFactory()
+        # 预热常用策略（与 chunk_text 默认参数一致），首个请求无需再构建分割器
+        for method in ("by_pages", "by_paragraphs"):
+            self.strategy_factory.create_strategy(method)
+        self.strategy_factory.create_strategy("by_sentences", splitter="langchain")
+        self.strategy_factory.create_strategy("fixed_size", chunk_size=1000)
     
     def chunk_text(
         self,
@@ -195,8 +338,10 @@ class ChunkingService:
         method: Literal["by_pages", "fixed_size", "by_paragraphs", "by_sentences"],
         metadata: Dict[str, Any],
         page_map: List[Dict[str, Any]],
-        chunk_size: int = 1000
-    ) -> Dict[str, Any]:
+        chunk_size: int = 1000,
+        soa: bool = False,
+        sentence_splitter: Literal["langchain", "native"] = "langchain"
+    ) -> Union[Dict[str, Any], ChunkingResultSoA]:
         """
         将文本按指定方法分块
         
@@ -206,9 +351,11 @@ class ChunkingService:
             metadata: 文档元数据
             page_map: 页面映射列表
             chunk_size: 固定大小分块时的块大小
+            soa: 为 True 时返回列式存储的 ChunkingResultSoA 对象
+            sentence_splitter: 按句子分块时使用的分割器，见 SentenceChunkingStrategy
             
         Returns:
-            包含分块结果的文档数据结构
+            包含分块结果的文档数据结构；soa 为 True 时为 ChunkingResultSoA
         """
         try:
             # 验证输入
@@ -221,21 +368,28 @@ class ChunkingService:
             ]
             
             # 获取分块策略
-            strategy_kwargs = {"chunk_size": chunk_size} if method == "fixed_size" else {}
+            if method == "fixed_size":
+                strategy_kwargs = {"chunk_size": chunk_size}
+            elif method == "by_sentences":
+                strategy_kwargs = {"splitter": sentence_splitter}
+            else:
+                strategy_kwargs = {}
             strategy = self.strategy_factory.create_strategy(method, **strategy_kwargs)
             
             # 执行分块
             chunks = self._execute_chunking(strategy, page_data_list)
             
-            # 构建结果
-            result = self._build_result(chunks, metadata, method, page_data_list)
-            
             logger.info(
                 f"Successfully chunked document '{metadata.get('filename', 'unknown')}' "
                 f"using method '{method}': {len(chunks)} chunks from {len(page_data_list)} pages"
             )
             
-            return asdict(result)
+            # 构建结果
+            if soa:
+                return self._build_result_soa(chunks, metadata, method, page_data_list)
+            
+            result = self._build_result(chunks, metadata, method, page_data_list)
+            return self._to_dict(result)
             
         except Exception as e:
             logger.error(f"Error in chunk_text: {str(e)}", exc_info=True)
@@ -256,15 +410,7 @@ class ChunkingService:
         page_data_list: List[PageData]
     ) -> List[Chunk]:
         """执行分块操作"""
-        chunks = []
-        chunk_id_counter = 1
-        
-        for page_data in page_data_list:
-            page_chunks = strategy.chunk_page(page_data, chunk_id_counter)
-            chunks.extend(page_chunks)
-            chunk_id_counter += len(page_chunks)
-        
-        return chunks
+        return strategy.chunk_pages(page_data_list, 1)
     
     def _build_result(
         self,
@@ -283,6 +429,54 @@ class ChunkingService:
             timestamp=datetime.now().isoformat(),
             chunks=chunks
         )
+    
+    def _build_result_soa(
+        self,
+        chunks: List[Chunk],
+        metadata: Dict[str, Any],
+        method: str,
+        page_data_list: List[PageData]
+    ) -> ChunkingResultSoA:
+        """构建列式存储的分块结果"""
+        return ChunkingResultSoA(
+            filename=metadata.get("filename", "unknown"),
+            total_chunks=len(chunks),
+            total_pages=len(page_data_list),
+            loading_method=metadata.get("loading_method", "unknown"),
+            chunking_method=method,
+            timestamp=datetime.now().isoformat(),
+            contents=[chunk.content for chunk in chunks],
+            chunk_ids=array('i', [chunk.metadata.chunk_id for chunk in chunks]),
+            page_numbers=array('i', [chunk.metadata.page_number for chunk in chunks]),
+            word_counts=array('i', [chunk.metadata.word_count for chunk in chunks])
+        )
+    
+    def _to_dict(self, result: ChunkingResult) -> Dict[str, Any]:
+        """
+        将分块结果转换为字典
+
+        与 dataclasses.asdict 输出一致，但直接构建而不做递归深拷贝（字符串不可变，可安全共享）
+        """
+        return {
+            "filename": result.filename,
+            "total_chunks": result.total_chunks,
+            "total_pages": result.total_pages,
+            "loading_method": result.loading_method,
+            "chunking_method": result.chunking_method,
+            "timestamp": result.timestamp,
+            "chunks": [
+                {
+                    "content": chunk.content,
+                    "metadata": {
+                        "chunk_id": chunk.metadata.chunk_id,
+                        "page_number": chunk.metadata.page_number,
+                        "page_range": chunk.metadata.page_range,
+                        "word_count": chunk.metadata.word_count,
+                    },
+                }
+                for chunk in result.chunks
+            ],
+        }
 
 # ===================== 使用示例 =====================
 def example_usage():
@@ -5,11 +5,77 @@ import logging
 import os
 from datetime import datetime
 import json
+import numpy as np
+try:
+    import orjson
+except ImportError:  # orjson 不可用时回退到标准库 json
+    orjson = None
 from pdfminer.high_level import extract_pages
 from pdfminer.layout import LTTextContainer, LTChar, LAParams, LTRect, LTLine
 import re
 
 logger = logging.getLogger(__name__)
+
+# 单元格文本空白归一化：_WS_RE 将连续空白压缩为单个空格；
+# _DIRTY_WS_RE 检测是否存在非空格的空白字符或连续空格，文本已规整时跳过替换
+_WS_RE = re.compile(r'\s+')
+_DIRTY_WS_RE = re.compile(r'[^\S ]| {2}')
+
+# 表格单元格分隔符，输出行格式为 "\t 内容1 \t 内容2 \t"
+_CELL_SEP = " \t "
+
+# 可直接 JSON 序列化的标量类型，元数据清洗时据此跳过序列化探测
+_JSON_SCALAR = (str, int, float, bool, type(None))
+
+
+def _is_json_serializable(value) -> bool:
+    """
+    判断元数据值能否被 JSON 序列化。
+    标量及仅含标量的列表/字典直接判定，其他类型才回退到 json.dumps 探测。
+    """
+    if isinstance(value, _JSON_SCALAR):
+        return True
+    if isinstance(value, (list, tuple)):
+        if all(isinstance(item, _JSON_SCALAR) for item in value):
+            return True
+    elif isinstance(value, dict):
+        if all(isinstance(k, str) and isinstance(v, _JSON_SCALAR) for k, v in value.items()):
+            return True
+    try:
+        json.dumps(value)
+        return True
+    except (TypeError, ValueError, OverflowError):
+        return False
+
+
+def _group_rows(text_elements: list, row_threshold: float) -> list:
+    """
+    将文本元素按 Y 坐标分组为行，并在行内按 X 坐标从左到右排序。
+
+    元素按 y0 从上到下排序后，每一行以首个元素的 y0 为基准，
+    与基准相差小于 row_threshold 的后续元素归入同一行。
+    行的边界通过 searchsorted 在 NumPy 中一次定位，Python 层只按行循环。
+    """
+    ys = np.fromiter((t['y0'] for t in text_elements), dtype=np.float64, count=len(text_elements))
+    xs = np.fromiter((t['x0'] for t in text_elements), dtype=np.float64, count=len(text_elements))
+
+    # 稳定排序，保持与 list.sort 相同的并列顺序；取负后为升序，便于 searchsorted
+    order = np.argsort(-ys, kind='stable')
+    neg_ys = -ys[order]
+
+    rows = []
+    start = 0
+    n = len(order)
+    while start < n:
+        # 同一行：y0 > 基准 - 阈值，即 -y0 < -基准 + 阈值
+        stop = int(np.searchsorted(neg_ys, neg_ys[start] + row_threshold, side='left'))
+        row_idx = order[start:stop]
+        row_idx = row_idx[np.argsort(xs[row_idx], kind='stable')]
+        rows.append([text_elements[i] for i in row_idx])
+        start = stop
+    return rows
+
+
 """
 PDF文档加载服务类
     这个服务类提供了多种PDF文档加载方法，支持不同的加载策略和分块选项。
@@ -28,7 +94,7 @@ class LoadingService:
         self.total_pages = 0
         self.current_page_map = []
     
-    def load_pdf(self, file_path: str, method: str, strategy: str = None, chunking_strategy: str = None, chunking_options: dict = None) -> str:
+    def load_pdf(self, file_path: str, method: str, strategy: str = None, chunking_strategy: str = None, chunking_options: dict = None, return_text: bool = True) -> str:
         """
         加载PDF文档的主方法，支持多种加载策略。
 
@@ -38,26 +104,29 @@ class LoadingService:
             strategy (str, optional): 使用unstructured方法时的策略，可选 'fast', 'hi_res', 'ocr_only'
             chunking_strategy (str, optional): 文本分块策略，可选 'basic', 'by_title'
             chunking_options (dict, optional): 分块选项配置
+            return_text (bool, optional): 是否拼接并返回全文；只需要页面映射时设为 False，
+                省去全文拼接，返回空字符串
 
         返回:
             str: 提取的文本内容
         """
         try:
             if method == "pymupdf":
-                return self._load_with_pymupdf(file_path)
+                return self._load_with_pymupdf(file_path, return_text)
             elif method == "pypdf":
-                return self._load_with_pypdf(file_path)
+                return self._load_with_pypdf(file_path, return_text)
             elif method == "pdfplumber":
-                return self._load_with_pdfplumber(file_path)
+                return self._load_with_pdfplumber(file_path, return_text)
             elif method == "unstructured":
                 return self._load_with_unstructured(
                     file_path, 
                     strategy=strategy,
                     chunking_strategy=chunking_strategy,
-                    chunking_options=chunking_options
+                    chunking_options=chunking_options,
+                    return_text=return_text
                 )
             elif method == "pdfminer":
-                return self._load_with_pdfminer(file_path)
+                return self._load_with_pdfminer(file_path, return_text)
             else:
                 raise ValueError(f"Unsupported loading method: {method}")
         except Exception as e:
@@ -71,7 +140,7 @@ class LoadingService:
         返回:
             int: 文档总页数
         """
-        return max(page_data['page'] for page_data in self.current_page_map) if self.current_page_map else 0
+        return self.total_pages
     
     def get_page_map(self) -> list:
         """
@@ -82,41 +151,66 @@ class LoadingService:
         """
         return self.current_page_map
     
-    def _load_with_pymupdf(self, file_path: str) -> str:
+    def _join_text(self, text_blocks: list, return_text: bool) -> str:
+        """
+        将页面文本块拼接为全文。
+
+        参数:
+            text_blocks (list): 页面文本块列表
+            return_text (bool): 为 False 时跳过拼接，直接返回空字符串
+
+        返回:
+            str: 拼接后的全文
+        """
+        if not return_text:
+            return ""
+        # str.join 会先把生成器物化为列表，直接传列表可省去这一步；
+        # join 本身按总长度一次分配结果，比 StringIO 逐段写入更快
+        return "\n".join([block["text"] for block in text_blocks])
+    
+    def _load_with_pymupdf(self, file_path: str, return_text: bool = True) -> str:
         """
         使用PyMuPDF库加载PDF文档。
         适合快速处理大量PDF文件，性能最佳。
 
         参数:
             file_path (str): PDF文件路径
+            return_text (bool): 是否拼接并返回全文
 
         返回:
             str: 提取的文本内容
         """
-        text_blocks = []
         try:
+            # 逐页串行提取：PyMuPDF 的扩展模块在 get_text 期间不释放 GIL（未调用 PyEval_SaveThread），
+            # 线程池无法并行；多进程则需每个进程重新打开并解析文档，收益未经多核实测，暂不采用
             with fitz.open(file_path) as doc:
                 self.total_pages = len(doc)
-                for page_num, page in enumerate(doc, 1):
-                    text = page.get_text("text")
-                    if text.strip():
-                        text_blocks.append({
-                            "text": text.strip(),
-                            "page": page_num
-                        })
+                page_texts = [page.get_text("text") for page in doc]
+            
+            # 每页只 strip 一次，空页在生成器中直接过滤
+            stripped_pages = (
+                (page_num, text.strip())
+                for page_num, text in enumerate(page_texts, 1)
+            )
+            text_blocks = [
+                {"text": text, "page": page_num}
+                for page_num, text in stripped_pages
+                if text
+            ]
             self.current_page_map = text_blocks
-            return "\n".join(block["text"] for block in text_blocks)
+            return self._join_text(text_blocks, return_text)
         except Exception as e:
             logger.error(f"PyMuPDF error: {str(e)}")
             raise
     
-    def _load_with_pypdf(self, file_path: str) -> str:
+    def _load_with_pypdf(self, file_path: str, return_text: bool = True) -> str:
         """
         使用PyPDF库加载PDF文档。
         适合简单的PDF文本提取，依赖较少。
 
         参数:
             file_path (str): PDF文件路径
+            return_text (bool): 是否拼接并返回全文
 
         返回:
             str: 提取的文本内容
@@ -134,12 +228,12 @@ class LoadingService:
                             "page": page_num
                         })
             self.current_page_map = text_blocks
-            return "\n".join(block["text"] for block in text_blocks)
+            return self._join_text(text_blocks, return_text)
         except Exception as e:
             logger.error(f"PyPDF error: {str(e)}")
             raise
     
-    def _load_with_unstructured(self, file_path: str, strategy: str = "fast", chunking_strategy: str = "basic", chunking_options: dict = None) -> str:
+    def _load_with_unstructured(self, file_path: str, strategy: str = "fast", chunking_strategy: str = "basic", chunking_options: dict = None, return_text: bool = True) -> str:
         """
         使用unstructured库加载PDF文档。
         适合需要更好的文档结构识别和灵活分块策略的场景。
@@ -149,6 +243,7 @@ class LoadingService:
             strategy (str): 加载策略，默认'fast'
             chunking_strategy (str): 分块策略，默认'basic'
             chunking_options (dict): 分块选项配置
+            return_text (bool): 是否拼接并返回全文
 
         返回:
             str: 提取的文本内容
@@ -212,11 +307,9 @@ class LoadingService:
                         if key == '_known_field_names':
                             continue
 
-                        try:
-                            # Try JSON serialization to test if value is serializable
-                            json.dumps({key: value})
+                        if _is_json_serializable(value):
                             cleaned_metadata[key] = value
-                        except (TypeError, OverflowError):
+                        else:
                             # If not serializable, convert to string
                             cleaned_metadata[key] = str(value)
 
@@ -233,19 +326,20 @@ class LoadingService:
 
             self.total_pages = max(pages) if pages else 0
             self.current_page_map = text_blocks
-            return "\n".join(block["text"] for block in text_blocks)
+            return self._join_text(text_blocks, return_text)
             
         except Exception as e:
             logger.error(f"Unstructured error: {str(e)}")
             raise
 
-    def _load_with_pdfplumber(self, file_path: str) -> str:
+    def _load_with_pdfplumber(self, file_path: str, return_text: bool = True) -> str:
         """
         使用pdfplumber库加载PDF文档。
         适合需要处理表格或需要文本位置信息的场景。
 
         参数:
             file_path (str): PDF文件路径
+            return_text (bool): 是否拼接并返回全文
 
         返回:
             str: 提取的文本内容
@@ -262,7 +356,7 @@ class LoadingService:
                             "page": page_num
                         })
             self.current_page_map = text_blocks
-            return "\n".join(block["text"] for block in text_blocks)
+            return self._join_text(text_blocks, return_text)
         except Exception as e:
             logger.error(f"pdfplumber error: {str(e)}")
             raise
@@ -309,8 +403,13 @@ class LoadingService:
             filepath = os.path.join("01-loaded-docs", f"{doc_name}.json")
             os.makedirs("01-loaded-docs", exist_ok=True)
             
-            with open(filepath, 'w', encoding='utf-8') as f:
-                json.dump(document_data, f, ensure_ascii=False, indent=2)
+            if orjson is not None:
+                # orjson 直接输出 UTF-8 字节（等价于 ensure_ascii=False），以二进制写入
+                with open(filepath, 'wb') as f:
+                    f.write(orjson.dumps(document_data, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS))
+            else:
+                with open(filepath, 'w', encoding='utf-8') as f:
+                    json.dump(document_data, f, ensure_ascii=False, indent=2)
                 
             return filepath
             
@@ -322,6 +421,8 @@ class LoadingService:
         """
         从PDF中提取表格数据，返回制表符分隔的字符串
         格式：\t 内容1 \t 内容2 \t ...
+
+        pdf_path 可以是文件路径，也可以是已打开的二进制文件对象或 mmap
         """
         
         # 存储所有页面的表格数据
@@ -329,107 +430,90 @@ class LoadingService:
         
         # 提取页面布局信息
         for page_layout in extract_pages(pdf_path):
-            page_tables = []
-            
-            # 收集页面中的所有文本元素和线框元素
-            text_elements = []
-            line_elements = []
-            
-            for element in page_layout:
-                if isinstance(element, LTTextContainer):
-                    # 获取文本的精确位置和内容
-                    text = element.get_text().strip()
-                    if text:  # 只处理非空文本
-                        x0, y0, x1, y1 = element.bbox
-                        text_elements.append({
-                            'text': text,
-                            'x0': x0,
-                            'y0': y0,
-                            'x1': x1,
-                            'y1': y1,
-                            'page_height': page_layout.height
-                        })
-                elif isinstance(element, LTRect) or isinstance(element, LTLine):
-                    # 收集表格线框
+            all_tables_data.extend(self._extract_tables_from_page(page_layout))
+        
+        # 将表格数据转换为所需格式的字符串：使用制表符分隔每个单元格，并在前后添加\t
+        return [f"\t {_CELL_SEP.join(row)} \t" for row in all_tables_data]
+
+    def _extract_tables_from_page(self, page_layout) -> list:
+        """
+        从单个页面布局中提取表格行。
+
+        参数:
+            page_layout: pdfminer 解析得到的页面布局对象
+
+        返回:
+            list: 表格行列表，每行为清理后的单元格文本列表
+        """
+        page_tables = []
+        
+        # 收集页面中的所有文本元素和线框元素
+        text_elements = []
+        line_elements = []
+        
+        for element in page_layout:
+            if isinstance(element, LTTextContainer):
+                # 获取文本的精确位置和内容
+                text = element.get_text().strip()
+                if text:  # 只处理非空文本
                     x0, y0, x1, y1 = element.bbox
-                    line_elements.append({
-                        'type': 'rect' if isinstance(element, LTRect) else 'line',
+                    text_elements.append({
+                        'text': text,
                         'x0': x0,
                         'y0': y0,
                         'x1': x1,
-                        'y1': y1
+                        'y1': y1,
+                        'page_height': page_layout.height
                     })
-            
-            if not text_elements:
-                continue
-            
-            # 根据Y坐标对文本进行分组（行）
-            # 先将文本按Y坐标排序（从上到下）
-            text_elements.sort(key=lambda x: -x['y0'])  # 负号表示从上到下
-            
-            # 识别行：Y坐标相近的文本归为同一行
-            rows = []
-            current_row = []
-            row_y = None
-            row_threshold = 5  # Y坐标相差小于5像素的视为同一行
-            
-            for text in text_elements:
-                if row_y is None:
-                    row_y = text['y0']
-                    current_row.append(text)
-                elif abs(text['y0'] - row_y) < row_threshold:
-                    current_row.append(text)
-                else:
-                    # 当前行结束，开始新行
-                    if current_row:
-                        rows.append(current_row)
-                    current_row = [text]
-                    row_y = text['y0']
-            
-            if current_row:
-                rows.append(current_row)
-            
-            # 对每行内的文本按X坐标排序（从左到右）
-            for row in rows:
-                row.sort(key=lambda x: x['x0'])
-            
-            # 转换为表格格式
-            for row in rows:
-                row_data = []
-                for cell in row:
-                    # 清理文本：移除多余的空格和换行
-                    clean_text = re.sub(r'\s+', ' ', cell['text']).strip()
-                    if clean_text:
-                        row_data.append(clean_text)
-                
-                if row_data:  # 只处理非空行
-                    page_tables.append(row_data)
-            
-            if page_tables:
-                all_tables_data.extend(page_tables)
+            elif isinstance(element, LTRect) or isinstance(element, LTLine):
+                # 收集表格线框
+                x0, y0, x1, y1 = element.bbox
+                line_elements.append({
+                    'type': 'rect' if isinstance(element, LTRect) else 'line',
+                    'x0': x0,
+                    'y0': y0,
+                    'x1': x1,
+                    'y1': y1
+                })
+        
+        if not text_elements:
+            return page_tables
         
-        # 将表格数据转换为所需格式的字符串
-        result_strings = []
-        for row in all_tables_data:
-            # 使用制表符分隔每个单元格，并在前后添加\t
-            row_str = "\t " + " \t ".join(row) + " \t"
-            result_strings.append(row_str)
+        # 根据Y坐标对文本进行分组（行），行内按X坐标排序（从左到右）
+        row_threshold = 5  # Y坐标相差小于5像素的视为同一行
+        rows = _group_rows(text_elements, row_threshold)
         
-        return result_strings
+        # 转换为表格格式
+        for row in rows:
+            row_data = []
+            for cell in row:
+                # 清理文本：移除多余的空格和换行
+                clean_text = cell['text'].strip()
+                if _DIRTY_WS_RE.search(clean_text):
+                    clean_text = _WS_RE.sub(' ', clean_text)
+                if clean_text:
+                    row_data.append(clean_text)
+            
+            if row_data:  # 只处理非空行
+                page_tables.append(row_data)
+        
+        return page_tables
 
-    def _load_with_pdfminer(self, file_path: str) -> str:
+    def _load_with_pdfminer(self, file_path: str, return_text: bool = True) -> str:
         
         """
         使用pdfminer库加载PDF文档。
+        页面只解析一次，同时提取正文文本与表格行。
 
         参数:
             file_path (str): PDF文件路径
+            return_text (bool): 是否拼接并返回全文
 
         返回:
             str: 提取的文本内容
         """
-        text_by_page = {}
         text_blocks = []
+        table_rows = []
         # 遍历所有页面
         for page_num, page_layout in enumerate(extract_pages(file_path)):
             page_text = ""
@@ -443,20 +527,18 @@ class LoadingService:
                 "page": page_num + 1,
                 "metadata": "text"
             })
+            table_rows.extend(self._extract_tables_from_page(page_layout))
 
-        tables = self.extract_pdf_tables(file_path)
-
-        table_row = 0
-
-        for table in tables:
-            text_blocks.append({
-                "text": table.strip(),
-                "page": table_row + 1,
+        # 单元格已去除首尾空白，直接用分隔符拼接即等价于格式化后再 strip
+        text_blocks.extend(
+            {
+                "text": _CELL_SEP.join(row),
+                "page": table_row,
                 "metadata": "table"
-            })
-            table_row += 1
+            }
+            for table_row, row in enumerate(table_rows, 1)
+        )
 
         self.total_pages = page_num + 1
         self.current_page_map.extend(text_blocks)
-        text_by_page = "\n".join(block["text"] for block in text_blocks)
-        return text_by_page
+        return self._join_text(text_blocks, return_text)
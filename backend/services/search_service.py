@@ -1,7 +1,8 @@
 from typing import List, Dict, Any, Optional
 import logging
 from datetime import datetime
-from pymilvus import connections, Collection, utility
+import numpy as np
+from pymilvus import connections, Collection, DataType, utility
 from services.embedding_service import EmbeddingService
 from utils.config import VectorDBProvider, MILVUS_CONFIG
 import os
@@ -191,14 +192,25 @@ class SearchService:
             )
             logger.info(f"Query embedding created with dimension: {len(query_embedding)}")
             
-            # 执行搜索
+            # 执行搜索：度量与检索参数跟随向量字段上实际建立的索引
+            index_params = next(
+                (index.params for index in collection.indexes if index.field_name == "vector"), {}
+            )
+            params = dict(MILVUS_CONFIG["search_params"].get(index_params.get("index_type"), {"nprobe": 10}))
+            if "ef" in params:
+                params["ef"] = max(params["ef"], top_k)
             search_params = {
-                "metric_type": "COSINE",
-                "params": {"nprobe": 10}
+                "metric_type": index_params.get("metric_type", MILVUS_CONFIG["metric_type"]),
+                "params": params
             }
             logger.info(f"Executing search with params: {search_params}")
             logger.info(f"Word count threshold filter: word_count >= {word_count_threshold}")
             
+            # FLOAT16_VECTOR 字段要求查询向量也为 float16
+            vector_field = next(field for field in collection.schema.fields if field.name == "vector")
+            if vector_field.dtype == DataType.FLOAT16_VECTOR:
+                query_embedding = np.asarray(query_embedding, dtype=np.float16)
+            
             results = collection.search(
                 data=[query_embedding],
                 anns_field="vector",
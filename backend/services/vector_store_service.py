@@ -1,17 +1,31 @@
+import functools
 import os
+import re
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from itertools import islice
 import json
-from typing import List, Dict, Any
+import threading
+import numpy as np
+from typing import List, Dict, Any, Iterator, Tuple
 import logging
 from pathlib import Path
 try:
     import chromadb
-    from chromadb.config import Settings
     CHROMA_AVAILABLE = True
 except Exception:
     chromadb = None
-    Settings = None
     CHROMA_AVAILABLE = False
+try:
+    import orjson
+except ImportError:  # orjson 不可用时回退到标准库 json
+    orjson = None
+try:
+    import ijson
+    IJSON_AVAILABLE = True
+except Exception:
+    ijson = None
+    IJSON_AVAILABLE = False
 from pymilvus import connections, utility
 from pymilvus import Collection, DataType, FieldSchema, CollectionSchema
 from utils.config import VectorDBProvider, MILVUS_CONFIG  # Updated import
@@ -19,21 +33,91 @@ from pypinyin import lazy_pinyin, Style
 
 logger = logging.getLogger(__name__)
 
+# 嵌入文件超过该大小（字节）时才流式解析，较小的文件直接整体读入
+STREAMING_THRESHOLD = 512 * 1024 * 1024
+
+# 流式解析时必须从顶层取到的配置；EmbeddingService 把配置写在 embeddings 之前，取到后即可停止扫描
+_REQUIRED_HEADER_KEYS = ("filename", "vector_dimension")
+
+# 向量分批写入的批大小，以及 Milvus 并发写入的最大批数
+BATCH_SIZE = 5000
+MAX_CONCURRENCY = 8
+
+# 字段类型名到 Milvus DataType 的映射，在导入时解析一次
+_FIELD_DTYPES = {
+    name: getattr(DataType, name)
+    for name in ("INT64", "VARCHAR", *MILVUS_CONFIG["vector_precisions"].values())
+}
+
+# 集合名只允许字母、数字和下划线，其余字符统一替换为下划线
+_SANITIZE_RE = re.compile(r'[^A-Za-z0-9_]')
+
+@functools.lru_cache(maxsize=1024)
+def _sanitize_collection_name(filename: str) -> str:
+    """
+    根据文件名生成合法的集合名前缀：去掉 .pdf 后缀，中文转拼音，非法字符替换为下划线
+    
+    参数:
+        filename: 原始文件名
+        
+    返回:
+        集合名前缀
+    """
+    # 如果有 .pdf 后缀，移除它
+    base_name = filename.replace('.pdf', '') if filename else ""
+    
+    # Convert Chinese characters to pinyin, then replace every other illegal character;
+    # an empty result (e.g. filename ".pdf") falls back to "doc"
+    base_name = _SANITIZE_RE.sub('_', ''.join(lazy_pinyin(base_name, style=Style.NORMAL))) or "doc"
+    
+    # Ensure the collection name starts with a letter or underscore
+    if not base_name[:1].isalpha() and not base_name.startswith('_'):
+        base_name = f"_{base_name}"
+    return base_name
+
+def _batched(iterable, size: int):
+    """将可迭代对象按 size 切分为列表批次"""
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
 class VectorDBConfig:
     """
     向量数据库配置类，用于存储和管理向量数据库的配置信息
+    
+    Milvus 索引取舍：FLAT 为暴力扫描，召回率 100% 但查询为 O(N)，十万级以上向量时成为瓶颈；
+    HNSW（M=32, efConstruction=200, ef=64）查询快 2~3 个数量级、召回率通常 >0.95，但建索引更慢、内存更大；
+    IVF_FLAT 介于两者之间，召回率由检索时的 nprobe 决定
     """
-    def __init__(self, provider: str, index_mode: str):
+    def __init__(self, provider: str, index_mode: str, vector_precision: str = "fp32"):
         """
         初始化向量数据库配置
         
         参数:
             provider: 向量数据库提供商名称
             index_mode: 索引模式
+            vector_precision: Milvus 向量存储精度，"fp32" | "fp16" | "int8"，
+                精度越低写入和索引越省内存，但召回率略有下降
         """
+        if vector_precision not in MILVUS_CONFIG["vector_precisions"]:
+            raise ValueError(f"Unsupported vector precision: {vector_precision}")
         self.provider = provider
         self.index_mode = index_mode
+        self.vector_precision = vector_precision
         self.milvus_uri = MILVUS_CONFIG["uri"]
+        # int8 依赖 IVF_SQ8 索引，Milvus Lite（本地 .db 文件）不支持；索引在写入之后才创建，需在写入前拒绝
+        if vector_precision == "int8" and self._is_milvus_lite():
+            raise ValueError(
+                "Vector precision 'int8' requires the IVF_SQ8 index, which Milvus Lite "
+                f"({self.milvus_uri}) does not support; use 'fp32' or 'fp16'"
+            )
+
+    def _is_milvus_lite(self) -> bool:
+        """是否使用 Milvus Lite（本地 .db 文件）"""
+        return self.milvus_uri.endswith(".db")
 
     def _get_milvus_index_type(self, index_mode: str) -> str:
         """
@@ -45,7 +129,10 @@ class VectorDBConfig:
         返回:
             对应的Milvus索引类型
         """
-        return MILVUS_CONFIG["index_types"].get(index_mode, "FLAT")
+        if self.vector_precision == "int8" and not self._is_milvus_lite():
+            return MILVUS_CONFIG["index_types"]["ivf_sq8"]
+        index_types = MILVUS_CONFIG["index_types"]
+        return index_types.get(index_mode) or index_types[MILVUS_CONFIG["default_index_mode"]]
     
     def _get_milvus_index_params(self, index_mode: str) -> Dict[str, Any]:
         """
@@ -57,7 +144,21 @@ class VectorDBConfig:
         返回:
             对应的Milvus索引参数字典
         """
-        return MILVUS_CONFIG["index_params"].get(index_mode, {})
+        if self.vector_precision == "int8" and not self._is_milvus_lite():
+            return MILVUS_CONFIG["index_params"]["ivf_sq8"]
+        index_params = MILVUS_CONFIG["index_params"]
+        if index_mode not in index_params:
+            index_mode = MILVUS_CONFIG["default_index_mode"]
+        return index_params[index_mode]
+
+    def _get_milvus_vector_dtype(self) -> str:
+        """
+        根据向量精度获取Milvus向量字段类型
+        
+        返回:
+            对应的Milvus向量字段类型名称
+        """
+        return MILVUS_CONFIG["vector_precisions"][self.vector_precision]
 
 class VectorStoreService:
     """
@@ -68,22 +169,37 @@ class VectorStoreService:
         初始化向量存储服务
         """
         self.initialized_dbs = {}
+        # Chroma 客户端在首次使用时创建并复用
+        self._chroma_client = None
         # 确保存储目录存在
         os.makedirs("03-vector-store", exist_ok=True)
 
-    def _safe_persist_client(self, client, settings=None):
+    def _connect_milvus(self, uri: str = MILVUS_CONFIG["uri"]) -> None:
         """
-        安全调用 chromadb client.persist()，兼容没有 persist 方法的旧/新版本 chromadb。
+        确保存在可复用的 Milvus 连接。
+        连接在各操作之间保持打开，仅在尚未连接（或被其他服务断开）时重新建立。
         """
-        try:
-            persist_fn = getattr(client, "persist", None)
-            if callable(persist_fn):
-                persist_fn()
-            else:
-                logger.info("Chroma client does not support persist() method.")
-        except Exception as e:
-            # 不要阻塞主流程，仅记录异常
-            logger.exception("Chroma client.persist() failed for %s: %s", (settings.persist_directory if settings else '<none>'), e)
+        if not connections.has_connection("default"):
+            connections.connect(alias="default", uri=uri)
+
+    def close(self) -> None:
+        """
+        关闭服务持有的数据库连接，供应用退出时调用
+        """
+        if connections.has_connection("default"):
+            connections.disconnect("default")
+        self._chroma_client = None
+
+    def _get_chroma_client(self):
+        """
+        获取 Chroma 客户端（本地目录持久化），首次调用时创建并缓存。
+        PersistentClient 写入时自动落盘，无需再手动调用 persist()。
+        """
+        if not CHROMA_AVAILABLE or chromadb is None:
+            raise RuntimeError("chromadb is not available. Please install chromadb to use CHROMA provider.")
+        if self._chroma_client is None:
+            self._chroma_client = chromadb.PersistentClient(path=str(Path("03-vector-store").resolve()))
+        return self._chroma_client
 
     def _get_chroma_index_type(self, config: VectorDBConfig) -> str:
         """
@@ -148,14 +264,14 @@ class VectorStoreService:
         """
         start_time = datetime.now()
         
-        # 读取embedding文件
-        embeddings_data = self._load_embeddings(embedding_file)
+        # 读取embedding文件：顶层配置立即可用，向量按需流式产出
+        embeddings_data, embeddings = self._load_embeddings(embedding_file)
         
         # 根据不同的数据库进行索引
         if config.provider == VectorDBProvider.MILVUS:
-            result = self._index_to_milvus(embeddings_data, config)
+            result = self._index_to_milvus(embeddings_data, embeddings, config)
         elif config.provider == VectorDBProvider.CHROMA:
-            result = self._index_to_chroma(embeddings_data, config)
+            result = self._index_to_chroma(embeddings_data, embeddings, config)
         
         end_time = datetime.now()
         processing_time = (end_time - start_time).total_seconds()
@@ -163,44 +279,83 @@ class VectorStoreService:
         return {
             "database": config.provider,
             "index_mode": config.index_mode,
-            "total_vectors": len(embeddings_data["embeddings"]),
+            "total_vectors": result.get("index_size", 0),
             "index_size": result.get("index_size", "N/A"),
             "processing_time": processing_time,
             "collection_name": result.get("collection_name", "N/A")
         }
     
-    def _load_embeddings(self, file_path: str) -> Dict[str, Any]:
+    def _load_embeddings(self, file_path: str) -> Tuple[Dict[str, Any], Iterator[Dict[str, Any]]]:
         """
-        加载embedding文件，返回配置信息和embeddings
+        加载embedding文件，返回顶层配置信息和逐条产出embedding的迭代器
+        
+        文件不超过 STREAMING_THRESHOLD 或未安装 ijson 时整体读入（优先用 orjson 解析）；
+        否则流式解析：先扫描顶层标量配置，配置位于 embeddings 之前时扫描到 embeddings 即停止
+        （缺少必需配置时才继续扫描整个文件），再按需逐条解析 embeddings，内存占用与文件大小无关。
         
         参数:
             file_path: 嵌入向量文件路径
             
         返回:
-            包含嵌入向量和元数据的字典
+            (顶层配置字典, embedding 迭代器) 元组
         """
         try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                logger.info(f"Loading embeddings from {file_path}")
-                
+            logger.info(f"Loading embeddings from {file_path}")
+            if not IJSON_AVAILABLE or os.path.getsize(file_path) <= STREAMING_THRESHOLD:
+                if orjson is not None:
+                    with open(file_path, 'rb') as f:
+                        data = orjson.loads(f.read())
+                else:
+                    with open(file_path, 'r', encoding='utf-8') as f:
+                        data = json.load(f)
                 if not isinstance(data, dict) or "embeddings" not in data:
                     raise ValueError("Invalid embedding file format: missing 'embeddings' key")
-                    
-                # 返回完整的数据，包括顶层配置
                 logger.info(f"Found {len(data['embeddings'])} embeddings")
-                return data
+                embeddings = data.pop("embeddings")
+                return data, iter(embeddings)
+            
+            header = {}
+            has_embeddings = False
+            with open(file_path, 'rb') as f:
+                for prefix, event, value in ijson.parse(f, use_float=True):
+                    if prefix == '' and event == 'map_key' and value == 'embeddings':
+                        has_embeddings = True
+                        if all(key in header for key in _REQUIRED_HEADER_KEYS):
+                            break
+                    elif '.' not in prefix and prefix and prefix != 'embeddings' and event in (
+                        'string', 'number', 'boolean', 'null'
+                    ):
+                        header[prefix] = value
+            
+            if not has_embeddings:
+                raise ValueError("Invalid embedding file format: missing 'embeddings' key")
+            
+            return header, self._iter_embeddings(file_path)
                 
         except Exception as e:
             logger.error(f"Error loading embeddings from {file_path}: {str(e)}")
             raise
     
-    def _index_to_milvus(self, embeddings_data: Dict[str, Any], config: VectorDBConfig) -> Dict[str, Any]:
+    def _iter_embeddings(self, file_path: str) -> Iterator[Dict[str, Any]]:
+        """
+        流式逐条产出 embeddings 数组中的元素
+        
+        参数:
+            file_path: 嵌入向量文件路径
+            
+        返回:
+            embedding 字典迭代器
+        """
+        with open(file_path, 'rb') as f:
+            yield from ijson.items(f, 'embeddings.item', use_float=True)
+    
+    def _index_to_milvus(self, embeddings_data: Dict[str, Any], embeddings: Iterator[Dict[str, Any]], config: VectorDBConfig) -> Dict[str, Any]:
         """
         将嵌入向量索引到Milvus数据库
         
         参数:
-            embeddings_data: 嵌入向量数据
+            embeddings_data: 嵌入文件的顶层配置
+            embeddings: embedding 迭代器
             config: 向量数据库配置对象
             
         返回:
@@ -208,30 +363,15 @@ class VectorStoreService:
         """
         try:
             # 使用 filename 作为 collection 名称前缀
-            filename = embeddings_data.get("filename", "")
-            # 如果有 .pdf 后缀，移除它
-            base_name = filename.replace('.pdf', '') if filename else "doc"
-            
-            # Convert Chinese characters to pinyin
-            base_name = ''.join(lazy_pinyin(base_name, style=Style.NORMAL))
-            
-            # Replace hyphens with underscores in the base name
-            base_name = base_name.replace('-', '_')
-            
-            # Ensure the collection name starts with a letter or underscore
-            if not base_name[0].isalpha() and base_name[0] != '_':
-                base_name = f"_{base_name}"
+            base_name = _sanitize_collection_name(embeddings_data.get("filename", ""))
             
             # Get embedding provider
             embedding_provider = embeddings_data.get("embedding_provider", "unknown")
             timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
             collection_name = f"{base_name}_{embedding_provider}_{timestamp}"
             
-            # 连接到Milvus
-            connections.connect(
-                alias="default", 
-                uri=config.milvus_uri
-            )
+            # 连接到Milvus（复用已有连接）
+            self._connect_milvus(config.milvus_uri)
             
             # 从顶层配置获取向量维度
             vector_dim = int(embeddings_data.get("vector_dimension"))
@@ -256,31 +396,12 @@ class VectorStoreService:
                 {"name": "embedding_timestamp", "dtype": "VARCHAR", "max_length": 50},
                 {
                     "name": "vector",
-                    "dtype": "FLOAT_VECTOR",
+                    "dtype": config._get_milvus_vector_dtype(),
                     "dim": vector_dim,
                     "params": self._get_milvus_index_params(config)
                 }
             ]
             
-            # 准备数据为列表格式
-            entities = []
-            for emb in embeddings_data["embeddings"]:
-                entity = {
-                    "content": str(emb["metadata"].get("content", "")),
-                    "document_name": embeddings_data.get("filename", ""),  # 使用 filename 而不是 document_name
-                    "chunk_id": int(emb["metadata"].get("chunk_id", 0)),
-                    "total_chunks": int(emb["metadata"].get("total_chunks", 0)),
-                    "word_count": int(emb["metadata"].get("word_count", 0)),
-                    "page_number": str(emb["metadata"].get("page_number", 0)),
-                    "page_range": str(emb["metadata"].get("page_range", "")),
-                    # "chunking_method": str(emb["metadata"].get("chunking_method", "")),
-                    "embedding_provider": embeddings_data.get("embedding_provider", ""),  # 从顶层配置获取
-                    "embedding_model": embeddings_data.get("embedding_model", ""),  # 从顶层配置获取
-                    "embedding_timestamp": str(emb["metadata"].get("embedding_timestamp", "")),
-                    "vector": [float(x) for x in emb.get("embedding", [])]
-                }
-                entities.append(entity)
-            
             logger.info(f"Creating Milvus collection: {collection_name}")
             
             # 创建collection
@@ -306,62 +427,108 @@ class VectorStoreService:
                     extra_params['params'] = field['params']
                 field_schema = FieldSchema(
                     name=field["name"], 
-                    dtype=getattr(DataType, field["dtype"]),
+                    dtype=_FIELD_DTYPES[field["dtype"]],
                     is_primary=field.get("is_primary", False),
                     auto_id=field.get("auto_id", False),
                     **extra_params
                 )
                 field_schemas.append(field_schema)
 
+            # 建表时不创建向量索引，索引在数据导入完成后再建
             schema = CollectionSchema(fields=field_schemas, description=f"Collection for {collection_name}")
             collection = Collection(name=collection_name, schema=schema)
             
-            # 插入数据
-            logger.info(f"Inserting {len(entities)} vectors")
-            insert_result = collection.insert(entities)
+            # 分批插入数据：每批按列格式组织（字段顺序同 schema，跳过自增主键），
+            # 多个批次并发写入，信号量限制在途批次数以控制内存
+            document_name = embeddings_data.get("filename", "")  # 使用 filename 而不是 document_name
+            embedding_provider_value = embeddings_data.get("embedding_provider", "")  # 从顶层配置获取
+            embedding_model = embeddings_data.get("embedding_model", "")  # 从顶层配置获取
+            # FLOAT16_VECTOR 字段直接写入 float16 矩阵，传输字节数减半
+            vector_dtype = np.float16 if config.vector_precision == "fp16" else np.float32
             
-            # 创建索引
-            index_params = {
-                "metric_type": "COSINE",
-                "index_type": self._get_milvus_index_type(config),
-                "params": self._get_milvus_index_params(config)
-            }
-            collection.create_index(field_name="vector", index_params=index_params)
+            def insert_batch(batch):
+                try:
+                    # 列式组装：整数列与向量列预分配为 NumPy 数组，单次遍历填充，每行只取一次 metadata
+                    n = len(batch)
+                    contents = [None] * n
+                    page_numbers = [None] * n
+                    page_ranges = [None] * n
+                    embedding_timestamps = [None] * n
+                    chunk_ids = np.empty(n, dtype=np.int64)
+                    total_chunks = np.empty(n, dtype=np.int64)
+                    word_counts = np.empty(n, dtype=np.int64)
+                    vectors = np.empty((n, vector_dim), dtype=vector_dtype)
+                    for i, emb in enumerate(batch):
+                        meta = emb["metadata"]
+                        contents[i] = str(meta.get("content", ""))
+                        chunk_ids[i] = int(meta.get("chunk_id", 0))
+                        total_chunks[i] = int(meta.get("total_chunks", 0))
+                        word_counts[i] = int(meta.get("word_count", 0))
+                        page_numbers[i] = str(meta.get("page_number", 0))
+                        page_ranges[i] = str(meta.get("page_range", ""))
+                        embedding_timestamps[i] = str(meta.get("embedding_timestamp", ""))
+                        vectors[i] = emb.get("embedding", [])
+                    columns = [
+                        contents,
+                        [document_name] * n,
+                        chunk_ids,
+                        total_chunks,
+                        word_counts,
+                        page_numbers,
+                        page_ranges,
+                        [embedding_provider_value] * n,
+                        [embedding_model] * n,
+                        embedding_timestamps,
+                        vectors,
+                    ]
+                    return len(collection.insert(columns).primary_keys)
+                finally:
+                    slots.release()
+            
+            slots = threading.Semaphore(MAX_CONCURRENCY)
+            futures = []
+            with ThreadPoolExecutor(max_workers=MAX_CONCURRENCY) as executor:
+                for batch in _batched(embeddings, BATCH_SIZE):
+                    slots.acquire()
+                    futures.append(executor.submit(insert_batch, batch))
+            inserted = sum(future.result() for future in futures)
+            logger.info(f"Inserted {inserted} vectors")
+            collection.flush()
+            
+            # 创建索引：必须在全部数据写入并 flush 之后再建，
+            # 先批量导入再一次性建索引远快于边写入边维护索引；重复运行时已有索引则跳过
+            if not any(index.field_name == "vector" for index in collection.indexes):
+                index_params = {
+                    "metric_type": MILVUS_CONFIG["metric_type"],
+                    "index_type": self._get_milvus_index_type(config),
+                    "params": self._get_milvus_index_params(config)
+                }
+                collection.create_index(field_name="vector", index_params=index_params)
             collection.load()
             
             return {
-                "index_size": len(insert_result.primary_keys),
+                "index_size": inserted,
                 "collection_name": collection_name
             }
             
         except Exception as e:
             logger.error(f"Error indexing to Milvus: {str(e)}")
             raise
-        
-        finally:
-            connections.disconnect("default")
 
-    def _index_to_chroma(self, embeddings_data: Dict[str, Any], config: VectorDBConfig) -> Dict[str, Any]:
+    def _index_to_chroma(self, embeddings_data: Dict[str, Any], embeddings: Iterator[Dict[str, Any]], config: VectorDBConfig) -> Dict[str, Any]:
         """
         将嵌入向量索引到 Chroma
         
         参数:
-            embeddings_data: 嵌入向量数据
+            embeddings_data: 嵌入文件的顶层配置
+            embeddings: embedding 迭代器
             config: 向量数据库配置对象
             
         返回:
             索引结果信息字典
         """
-        if not CHROMA_AVAILABLE or chromadb is None:
-            raise RuntimeError("chromadb is not available. Please install chromadb to use CHROMA provider.")
-
         try:
-            filename = embeddings_data.get("filename", "")
-            base_name = filename.replace('.pdf', '') if filename else "doc"
-            base_name = ''.join(lazy_pinyin(base_name, style=Style.NORMAL))
-            base_name = base_name.replace('-', '_')
-            if not base_name[0].isalpha() and base_name[0] != '_':
-                base_name = f"_{base_name}"
+            base_name = _sanitize_collection_name(embeddings_data.get("filename", ""))
 
             embedding_provider = embeddings_data.get("embedding_provider", "unknown")
             timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
@@ -369,23 +536,7 @@ class VectorStoreService:
             print(f"Chroma collection name: {collection_name}")
 
             # 创建/连接 Chroma 客户端（使用本地目录持久化）
-            settings = Settings(persist_directory=str(Path("03-vector-store").resolve())) if Settings is not None else None
-            client = chromadb.Client(settings) if settings is not None else chromadb.Client()
-
-            # 准备要插入的数据
-            embeddings = []
-            metadatas = []
-            documents = []
-            ids = []
-            for idx, emb in enumerate(embeddings_data.get("embeddings", [])):
-                ids.append(f"{timestamp}_{idx}")
-                vec = [float(x) for x in emb.get("embedding", [])]
-                embeddings.append(vec)
-                meta = emb.get("metadata", {})
-                # Ensure metadata values are JSON-serializable
-                safe_meta = {k: (v if isinstance(v, (str, int, float, bool, list, dict, type(None))) else str(v)) for k, v in meta.items()}
-                metadatas.append(safe_meta)
-                documents.append(str(meta.get("content", "")))
+            client = self._get_chroma_client()
 
             # 创建集合（如果已存在则获取）
             try:
@@ -393,15 +544,36 @@ class VectorStoreService:
             except Exception:
                 collection = client.create_collection(name=collection_name)
 
-            # 添加数据
-            collection.add(ids=ids, embeddings=embeddings, documents=documents, metadatas=metadatas)
-
-            # 持久化到磁盘（如果支持）
-            # 安全持久化（在某些 chromadb 版本中没有 persist 方法）
-            self._safe_persist_client(client, settings)
+            # 分批添加数据，向量直接组装为 float32 矩阵，避免逐元素构造 Python float
+            total = 0
+            for batch in _batched(embeddings, BATCH_SIZE):
+                ids = [f"{timestamp}_{idx}" for idx in range(total, total + len(batch))]
+                vectors = np.asarray([emb.get("embedding", []) for emb in batch], dtype=np.float32)
+                metadatas = []
+                documents = []
+                for emb in batch:
+                    meta = emb.get("metadata", {})
+                    content = str(meta.get("content", ""))
+                    # metadata 字段固定（见 EmbeddingService），按已知类型逐个转换，与 Milvus 路径一致
+                    metadatas.append({
+                        "chunk_id": int(meta.get("chunk_id", 0)),
+                        "page_number": int(meta.get("page_number", 0)),
+                        "page_range": str(meta.get("page_range", "")),
+                        "content": content,
+                        "word_count": int(meta.get("word_count", 0)),
+                        "total_chunks": int(meta.get("total_chunks", 0)),
+                        "embedding_provider": str(meta.get("embedding_provider", "")),
+                        "embedding_model": str(meta.get("embedding_model", "")),
+                        "embedding_timestamp": str(meta.get("embedding_timestamp", "")),
+                        "vector_dimension": int(meta.get("vector_dimension", 0)),
+                        "filename": str(meta.get("filename", ""))
+                    })
+                    documents.append(content)
+                collection.add(ids=ids, embeddings=vectors, documents=documents, metadatas=metadatas)
+                total += len(batch)
 
             return {
-                "index_size": len(ids),
+                "index_size": total,
                 "collection_name": collection_name
             }
 
@@ -420,35 +592,44 @@ class VectorStoreService:
             集合名称列表
         """
         if provider == VectorDBProvider.MILVUS:
-            try:
-                connections.connect(alias="default", uri=MILVUS_CONFIG["uri"])
-                collections = utility.list_collections()
-                return collections
-            finally:
-                connections.disconnect("default")
+            self._connect_milvus()
+            return utility.list_collections()
         elif provider == VectorDBProvider.CHROMA:
-            if not CHROMA_AVAILABLE or chromadb is None:
-                raise RuntimeError("chromadb is not available. Please install chromadb to use CHROMA provider.")
-            settings = Settings(persist_directory=str(Path("03-vector-store").resolve())) if Settings is not None else None
-            client = chromadb.Client(settings) if settings is not None else chromadb.Client()
-            try:
-                cols = client.list_collections()
-                # list_collections may return list of dicts like [{'name': '...'}]
-                names = []
-                for c in cols:
-                    if isinstance(c, dict) and 'name' in c:
-                        names.append(c['name'])
-                    elif hasattr(c, 'name'):
-                        names.append(getattr(c, 'name'))
-                    else:
-                        # fallback: string
-                        names.append(str(c))
-                return names
-            finally:
-                # 安全持久化
-                self._safe_persist_client(client, settings)
+            client = self._get_chroma_client()
+            cols = client.list_collections()
+            # list_collections may return list of dicts like [{'name': '...'}]
+            names = []
+            for c in cols:
+                if isinstance(c, dict) and 'name' in c:
+                    names.append(c['name'])
+                elif hasattr(c, 'name'):
+                    names.append(getattr(c, 'name'))
+                else:
+                    # fallback: string
+                    names.append(str(c))
+            return names
         return []
 
+    def list_all_collections(self) -> Dict[str, List[str]]:
+        """
+        并发列出所有提供商的集合，总耗时取决于最慢的提供商而不是两者之和
+        
+        返回:
+            以提供商名称为键的集合名称列表字典；某个提供商不可用时其列表为空
+        """
+        providers = [VectorDBProvider.MILVUS, VectorDBProvider.CHROMA]
+        with ThreadPoolExecutor(max_workers=len(providers)) as executor:
+            futures = {provider: executor.submit(self.list_collections, provider) for provider in providers}
+        
+        collections = {}
+        for provider, future in futures.items():
+            try:
+                collections[provider.value] = future.result()
+            except Exception as e:
+                logger.error(f"Error listing collections for provider {provider.value}: {str(e)}")
+                collections[provider.value] = []
+        return collections
+
     def delete_collection(self, provider: str, collection_name: str) -> bool:
         """
         删除指定的集合
@@ -461,17 +642,11 @@ class VectorStoreService:
             是否删除成功
         """
         if provider == VectorDBProvider.MILVUS:
-            try:
-                connections.connect(alias="default", uri=MILVUS_CONFIG["uri"])
-                utility.drop_collection(collection_name)
-                return True
-            finally:
-                connections.disconnect("default")
+            self._connect_milvus()
+            utility.drop_collection(collection_name)
+            return True
         elif provider == VectorDBProvider.CHROMA:
-            if not CHROMA_AVAILABLE or chromadb is None:
-                raise RuntimeError("chromadb is not available. Please install chromadb to use CHROMA provider.")
-            settings = Settings(persist_directory=str(Path("03-vector-store").resolve())) if Settings is not None else None
-            client = chromadb.Client(settings) if settings is not None else chromadb.Client()
+            client = self._get_chroma_client()
             try:
                 # try client.delete_collection if available
                 try:
@@ -497,39 +672,29 @@ class VectorStoreService:
             集合信息字典
         """
         if provider == VectorDBProvider.MILVUS:
-            try:
-                connections.connect(alias="default", uri=MILVUS_CONFIG["uri"])
-                collection = Collection(collection_name)
-                return {
-                    "name": collection_name,
-                    "num_entities": collection.num_entities,
-                    "schema": collection.schema.to_dict()
-                }
-            finally:
-                connections.disconnect("default")
+            self._connect_milvus()
+            collection = Collection(collection_name)
+            return {
+                "name": collection_name,
+                "num_entities": collection.num_entities,
+                "schema": collection.schema.to_dict()
+            }
         elif provider == VectorDBProvider.CHROMA:
-            if not CHROMA_AVAILABLE or chromadb is None:
-                raise RuntimeError("chromadb is not available. Please install chromadb to use CHROMA provider.")
-            settings = Settings(persist_directory=str(Path("03-vector-store").resolve())) if Settings is not None else None
-            client = chromadb.Client(settings) if settings is not None else chromadb.Client()
+            client = self._get_chroma_client()
+            collection = client.get_collection(name=collection_name)
+            num = None
             try:
-                collection = client.get_collection(name=collection_name)
-                num = None
+                num = collection.count()
+            except Exception:
+                # fallback: try querying a small batch to estimate
                 try:
-                    num = collection.count()
+                    res = collection.get(ids=[None], include=['metadatas'])
+                    num = len(res.get('ids', []))
                 except Exception:
-                    # fallback: try querying a small batch to estimate
-                    try:
-                        res = collection.get(ids=[None], include=['metadatas'])
-                        num = len(res.get('ids', []))
-                    except Exception:
-                        num = None
-                return {
-                    "name": collection_name,
-                    "num_entities": num,
-                    "schema": None
-                }
-            finally:
-                # 安全持久化
-                self._safe_persist_client(client, settings)
+                    num = None
+            return {
+                "name": collection_name,
+                "num_entities": num,
+                "schema": None
+            }
         return {}
\ No newline at end of file
@@ -1,224 +1,302 @@
 
-from pdfminer.high_level import extract_pages
-from pdfminer.layout import LTTextContainer, LTChar, LTRect, LTLine
+from pdfminer.layout import LTTextContainer, LTChar, LTRect, LTLine, LTCurve, LTFigure
+import numpy as np
+import pdfplumber
 import re
 import os
 import sys
 
+# 连续空白字符（空格、换行、制表符等）
+_WS_RE = re.compile(r'\s+')
+
+# pdfplumber 表格检测参数：按页面中的线框识别有边框的表格
+_TABLE_SETTINGS = {"vertical_strategy": "lines", "horizontal_strategy": "lines"}
+
+
+def _group_rows(text_elements, row_threshold):
+    """
+    将文本元素按Y坐标分组（行），行内按X坐标从左到右排序
+    每行以首个元素的Y坐标为基准，与基准相差小于row_threshold的元素归入同一行
+    """
+    ys = np.fromiter((t['y0'] for t in text_elements), dtype=np.float64, count=len(text_elements))
+    xs = np.fromiter((t['x0'] for t in text_elements), dtype=np.float64, count=len(text_elements))
+
+    # 稳定排序（从上到下），取负后为升序，便于 searchsorted 一次定位行尾
+    order = np.argsort(-ys, kind='stable')
+    neg_ys = -ys[order]
+
+    rows = []
+    start = 0
+    while start < len(order):
+        stop = int(np.searchsorted(neg_ys, neg_ys[start] + row_threshold, side='left'))
+        row_idx = order[start:stop]
+        row_idx = row_idx[np.argsort(xs[row_idx], kind='stable')]
+        rows.append([text_elements[i] for i in row_idx])
+        start = stop
+    return rows
+
+
+def _find_ruled_tables(page):
+    """
+    使用pdfplumber识别页面中有线框的表格
+    返回 [(bbox, 表格行列表), ...]，bbox 已换算为pdfminer坐标 (x0, y0, x1, y1)（原点在左下角）
+    """
+    tables = []
+    for table in page.find_tables(table_settings=_TABLE_SETTINGS):
+        rows = []
+        for row in table.extract():
+            # 合并单元格处为 None，清理文本并跳过空单元格
+            row_data = [_WS_RE.sub(' ', cell).strip() for cell in row if cell]
+            row_data = [cell for cell in row_data if cell]
+            if row_data:
+                rows.append(row_data)
+        if rows:
+            x0, top, x1, bottom = table.bbox
+            tables.append(((x0, page.height - bottom, x1, page.height - top), rows))
+    return tables
+
+
+def _has_ruling(elements):
+    """页面（或图形内部）是否有线条/矩形；没有时按线框检测不可能找到表格"""
+    for element in elements:
+        if isinstance(element, LTCurve):
+            return True
+        if isinstance(element, LTFigure) and _has_ruling(element):
+            return True
+    return False
+
+
+def _parse_pages(pdf_path):
+    """
+    解析PDF一次，返回按页码排序的 [(ruled_tables, page_layout), ...]
+    ruled_tables 为 _find_ruled_tables 的结果（没有线框表格时为空列表），page_layout 为pdfminer的版面分析结果
+    pdfplumber 按默认 LAParams 打开，线框检测和版面分析共用同一次解析；
+    线框检测需要把页面上所有对象转换一遍，只在页面上有线条时才做
+    解析结果可同时交给 extract_pdf_tables 和 extract_pdf_tables_enhanced 使用
+    """
+    pages = []
+    with pdfplumber.open(pdf_path, laparams={}) as pdf:
+        for page in pdf.pages:
+            page_layout = page.layout
+            ruled_tables = _find_ruled_tables(page) if _has_ruling(page_layout) else []
+            pages.append((ruled_tables, page_layout))
+    return pages
+
+
+def _split_by_tables(page_layout, ruled_tables):
+    """
+    去掉落在线框表格内的元素，其余元素按所在的上下位置分段
+    返回 len(ruled_tables) + 1 段元素列表：第 k 段位于第 k 个表格（从上到下）之上、第 k-1 个表格之下
+    """
+    table_boxes = [bbox for bbox, _ in ruled_tables]
+    table_centers = [(y0 + y1) / 2 for _, y0, _, y1 in table_boxes]
+    segments = [[] for _ in range(len(table_boxes) + 1)]
+    for element in page_layout:
+        x0, y0, x1, y1 = element.bbox
+        cx, cy = (x0 + x1) / 2, (y0 + y1) / 2
+        if any(bx0 <= cx <= bx1 and by0 <= cy <= by1 for bx0, by0, bx1, by1 in table_boxes):
+            continue
+        segments[sum(1 for center in table_centers if center > cy)].append(element)
+    return segments
+
+
+def _extract_tables(pdf_source, extract_page_rows):
+    """
+    提取所有页面的表格行：线框表格直接使用pdfplumber的检测结果，
+    表格之外的文本（以及没有线框表格的页面）交给 extract_page_rows 按文本位置重建，
+    各部分按在页面中从上到下的顺序输出
+    pdf_source 可以是PDF路径，也可以是 _parse_pages 的解析结果
+    """
+    if isinstance(pdf_source, (str, os.PathLike)):
+        pdf_source = _parse_pages(pdf_source)
+    
+    all_tables_data = []
+    for ruled_tables, page_layout in pdf_source:
+        if not ruled_tables:
+            all_tables_data.extend(extract_page_rows(page_layout))
+            continue
+        ruled_tables = sorted(ruled_tables, key=lambda table: -table[0][3])  # 从上到下
+        segments = _split_by_tables(page_layout, ruled_tables)
+        for segment, (_, rows) in zip(segments, ruled_tables):
+            all_tables_data.extend(extract_page_rows(segment))
+            all_tables_data.extend(rows)
+        all_tables_data.extend(extract_page_rows(segments[-1]))
+    return all_tables_data
+
+
+def _format_rows(all_tables_data):
+    """
+    将表格数据转换为所需格式的字符串
+    """
+    result_strings = []
+    for row in all_tables_data:
+        # 使用制表符分隔每个单元格，并在前后添加\t
+        row_str = "\t " + " \t ".join(row) + " \t"
+        result_strings.append(row_str)
+    
+    return "\n".join(result_strings)
+
+
+def _extract_page_rows(page_layout):
+    """
+    根据文本位置从单个页面布局（或其中部分元素的列表）中提取表格行（用于无边框或图片类表格）
+    """
+    page_tables = []
+
+    # 收集页面中的所有文本元素和线框元素
+    text_elements = []
+    line_elements = []
+
+    for element in page_layout:
+        if isinstance(element, LTTextContainer):
+            # 获取文本的精确位置和内容，收集时即清理多余的空格和换行
+            text = _WS_RE.sub(' ', element.get_text()).strip()
+            if text:  # 只处理非空文本
+                x0, y0, x1, y1 = element.bbox
+                text_elements.append({
+                    'text': text,
+                    'x0': x0,
+                    'y0': y0,
+                    'x1': x1,
+                    'y1': y1
+                })
+        elif isinstance(element, LTRect) or isinstance(element, LTLine):
+            # 收集表格线框
+            x0, y0, x1, y1 = element.bbox
+            line_elements.append({
+                'type': 'rect' if isinstance(element, LTRect) else 'line',
+                'x0': x0,
+                'y0': y0,
+                'x1': x1,
+                'y1': y1
+            })
+
+    if not text_elements:
+        return page_tables
+
+    # 根据Y坐标对文本进行分组（行），Y坐标相差小于5像素的视为同一行
+    rows = _group_rows(text_elements, row_threshold=5)
+
+    # 转换为表格格式
+    for row in rows:
+        # 文本在收集时已清理且非空
+        row_data = [cell['text'] for cell in row]
+
+        if row_data:  # 只处理非空行
+            page_tables.append(row_data)
+
+    return page_tables
+
+
 def extract_pdf_tables(pdf_path):
     """
     从PDF中提取表格数据，返回制表符分隔的字符串
     格式：\t 内容1 \t 内容2 \t ...
+    pdf_path 也可以传入 _parse_pages 的解析结果，避免重复解析
     """
     
     # 存储所有页面的表格数据
-    all_tables_data = []
+    all_tables_data = _extract_tables(pdf_path, _extract_page_rows)
     
-    # 提取页面布局信息
-    for page_layout in extract_pages(pdf_path):
-        page_tables = []
-        
-        # 收集页面中的所有文本元素和线框元素
-        text_elements = []
-        line_elements = []
-        
-        for element in page_layout:
-            if isinstance(element, LTTextContainer):
-                # 获取文本的精确位置和内容
-                text = element.get_text().strip()
-                if text:  # 只处理非空文本
-                    x0, y0, x1, y1 = element.bbox
-                    text_elements.append({
-                        'text': text,
-                        'x0': x0,
-                        'y0': y0,
-                        'x1': x1,
-                        'y1': y1,
-                        'page_height': page_layout.height
-                    })
-            elif isinstance(element, LTRect) or isinstance(element, LTLine):
-                # 收集表格线框
+    return _format_rows(all_tables_data)
+
+
+def _extract_page_rows_enhanced(page_layout):
+    """
+    根据文本位置从单个页面布局（或其中部分元素的列表）中提取表格行，并尝试识别列结构
+    """
+    # 收集所有文本元素
+    text_elements = []
+
+    for element in page_layout:
+        if isinstance(element, LTTextContainer):
+            text = element.get_text().strip()
+            if text:
                 x0, y0, x1, y1 = element.bbox
-                line_elements.append({
-                    'type': 'rect' if isinstance(element, LTRect) else 'line',
+                text_elements.append({
+                    'text': text,
                     'x0': x0,
                     'y0': y0,
                     'x1': x1,
                     'y1': y1
                 })
-        
-        if not text_elements:
-            continue
-        
-        # 根据Y坐标对文本进行分组（行）
-        # 先将文本按Y坐标排序（从上到下）
-        text_elements.sort(key=lambda x: -x['y0'])  # 负号表示从上到下
-        
-        # 识别行：Y坐标相近的文本归为同一行
-        rows = []
-        current_row = []
-        row_y = None
-        row_threshold = 5  # Y坐标相差小于5像素的视为同一行
-        
-        for text in text_elements:
-            if row_y is None:
-                row_y = text['y0']
-                current_row.append(text)
-            elif abs(text['y0'] - row_y) < row_threshold:
+
+    if not text_elements:
+        return []
+
+    # 按Y坐标分组（行）
+    text_elements.sort(key=lambda x: -x['y0'])  # 从上到下
+
+    # 更智能的行分组
+    rows = []
+    current_row = []
+
+    for i, text in enumerate(text_elements):
+        if not current_row:
+            current_row.append(text)
+        else:
+            # 检查是否与上一文本在同一行
+            last_text = current_row[-1]
+            y_diff = abs(text['y0'] - last_text['y0'])
+
+            # 如果Y坐标相近，且不在同一垂直位置，可能是同一行的不同列
+            if y_diff < 8:  # 8像素的阈值
                 current_row.append(text)
             else:
-                # 当前行结束，开始新行
-                if current_row:
-                    rows.append(current_row)
+                # 新行开始
+                rows.append(current_row)
                 current_row = [text]
-                row_y = text['y0']
-        
-        if current_row:
-            rows.append(current_row)
-        
-        # 对每行内的文本按X坐标排序（从左到右）
-        for row in rows:
-            row.sort(key=lambda x: x['x0'])
-        
-        # 转换为表格格式
-        for row in rows:
-            row_data = []
-            for cell in row:
-                # 清理文本：移除多余的空格和换行
-                clean_text = re.sub(r'\s+', ' ', cell['text']).strip()
-                if clean_text:
-                    row_data.append(clean_text)
-            
-            if row_data:  # 只处理非空行
-                page_tables.append(row_data)
-        
-        if page_tables:
-            all_tables_data.extend(page_tables)
-    
-    # 将表格数据转换为所需格式的字符串
-    result_strings = []
-    for row in all_tables_data:
-        # 使用制表符分隔每个单元格，并在前后添加\t
-        row_str = "\t " + " \t ".join(row) + " \t"
-        result_strings.append(row_str)
-    
-    return "\n".join(result_strings)
+
+    if current_row:
+        rows.append(current_row)
+
+    # 识别列边界：所有文本的 [x0, x1] 区间按x0排序后一次扫描，合并重叠的列（容差10像素）
+    intervals = np.array([[text['x0'], text['x1']] for row in rows for text in row], dtype=np.float64)
+    intervals = intervals[np.argsort(intervals[:, 0], kind='stable')].tolist()
+    merged_columns = []
+    lo, hi = intervals[0]
+    for x0, x1 in intervals[1:]:
+        if x0 > hi + 10:
+            merged_columns.append((lo, hi))
+            lo, hi = x0, x1
+        else:
+            hi = max(hi, x1)
+    merged_columns.append((lo, hi))
+    col_starts = np.array([col[0] for col in merged_columns], dtype=np.float64)
+
+    # 根据列边界整理数据
+    processed_rows = []
+    for row in rows:
+        row.sort(key=lambda x: x['x0'])
+        row_data = [''] * len(merged_columns)
+
+        # 二分查找文本所属的列：x0 不小于列起点的最后一列
+        col_ids = np.searchsorted(col_starts, [text['x0'] for text in row], side='right') - 1
+        for text, i in zip(row, col_ids.tolist()):
+            if i >= 0 and text['x1'] <= merged_columns[i][1] + 5:
+                if row_data[i]:
+                    row_data[i] += ' ' + text['text']
+                else:
+                    row_data[i] = text['text']
+
+        # 清理空列
+        row_data = [cell.strip() for cell in row_data if cell.strip()]
+        if row_data:
+            processed_rows.append(row_data)
+
+    return processed_rows
 
 
 def extract_pdf_tables_enhanced(pdf_path, min_column_width=20):
     """
     增强版的表格提取函数，尝试识别列结构
+    pdf_path 也可以传入 _parse_pages 的解析结果，避免重复解析
     """
     
-    all_tables_data = []
-    
-    for page_layout in extract_pages(pdf_path):
-        # 收集所有文本元素
-        text_elements = []
-        
-        for element in page_layout:
-            if isinstance(element, LTTextContainer):
-                text = element.get_text().strip()
-                if text:
-                    x0, y0, x1, y1 = element.bbox
-                    text_elements.append({
-                        'text': text,
-                        'x0': x0,
-                        'y0': y0,
-                        'x1': x1,
-                        'y1': y1
-                    })
-        
-        if not text_elements:
-            continue
-        
-        # 按Y坐标分组（行）
-        text_elements.sort(key=lambda x: -x['y0'])  # 从上到下
-        
-        # 更智能的行分组
-        rows = []
-        current_row = []
-        
-        for i, text in enumerate(text_elements):
-            if not current_row:
-                current_row.append(text)
-            else:
-                # 检查是否与上一文本在同一行
-                last_text = current_row[-1]
-                y_diff = abs(text['y0'] - last_text['y0'])
-                
-                # 如果Y坐标相近，且不在同一垂直位置，可能是同一行的不同列
-                if y_diff < 8:  # 8像素的阈值
-                    current_row.append(text)
-                else:
-                    # 新行开始
-                    rows.append(current_row)
-                    current_row = [text]
-        
-        if current_row:
-            rows.append(current_row)
-        
-        # 识别列边界
-        column_boundaries = []
-        for row in rows:
-            for text in row:
-                if not column_boundaries:
-                    column_boundaries.append([text['x0'], text['x1']])
-                else:
-                    found = False
-                    for col in column_boundaries:
-                        # 如果x0在现有列范围内，扩展列边界
-                        if text['x0'] >= col[0] - 5 and text['x0'] <= col[1] + 5:
-                            col[0] = min(col[0], text['x0'])
-                            col[1] = max(col[1], text['x1'])
-                            found = True
-                            break
-                    if not found:
-                        column_boundaries.append([text['x0'], text['x1']])
-        
-        # 合并重叠的列
-        column_boundaries.sort(key=lambda x: x[0])
-        merged_columns = []
-        for col in column_boundaries:
-            if not merged_columns:
-                merged_columns.append(col)
-            else:
-                last_col = merged_columns[-1]
-                if col[0] <= last_col[1] + 10:  # 有重叠
-                    last_col[1] = max(last_col[1], col[1])
-                else:
-                    merged_columns.append(col)
-        
-        # 根据列边界整理数据
-        processed_rows = []
-        for row in rows:
-            row.sort(key=lambda x: x['x0'])
-            row_data = [''] * len(merged_columns)
-            
-            for text in row:
-                # 找到文本属于哪一列
-                for i, col in enumerate(merged_columns):
-                    if text['x0'] >= col[0] - 5 and text['x1'] <= col[1] + 5:
-                        if row_data[i]:
-                            row_data[i] += ' ' + text['text']
-                        else:
-                            row_data[i] = text['text']
-                        break
-            
-            # 清理空列
-            row_data = [cell.strip() for cell in row_data if cell.strip()]
-            if row_data:
-                processed_rows.append(row_data)
-        
-        all_tables_data.extend(processed_rows)
+    all_tables_data = _extract_tables(pdf_path, _extract_page_rows_enhanced)
     
     # 转换为目标格式
-    result_strings = []
-    for row in all_tables_data:
-        row_str = "\t " + " \t ".join(row) + " \t"
-        result_strings.append(row_str)
-    
-    return "\n".join(result_strings)
+    return _format_rows(all_tables_data)
 
 
 # 使用示例
@@ -239,12 +317,15 @@ if __name__ == "__main__":
     pdf_file = file_path  # 替换为你的PDF文件路径
 
     try:
+        # 只解析一次PDF，两种提取方式共用解析结果
+        pages = _parse_pages(pdf_file)
+        
         print("=== 基本表格提取 ===")
-        result_basic = extract_pdf_tables(pdf_file)
+        result_basic = extract_pdf_tables(pages)
         print(result_basic)
         
         print("\n=== 增强版表格提取 ===")
-        result_enhanced = extract_pdf_tables_enhanced(pdf_file)
+        result_enhanced = extract_pdf_tables_enhanced(pages)
         print(result_enhanced)
         
         # 保存到文件
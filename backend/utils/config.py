@@ -19,9 +19,31 @@ MILVUS_CONFIG = {
         "flat": {},
         "ivf_flat": {"nlist": 1024},
         "ivf_sq8": {"nlist": 1024},
+        # 较小的 M / efConstruction 建索引更快，但召回率会略有下降
         "hnsw": {
-            "M": 16,
-            "efConstruction": 500
+            "M": 32,
+            "efConstruction": 200
         }
+    },
+    # 建索引与检索使用的相似度度量
+    "metric_type": "COSINE",
+    # 按索引类型的检索参数：nprobe 为 IVF 检索的聚类数，ef 为 HNSW 检索的候选集大小（不小于 top_k）
+    "search_params": {
+        "IVF_FLAT": {"nprobe": 10},
+        "IVF_SQ8": {"nprobe": 10},
+        "HNSW": {"ef": 64}
+    },
+    # 向量存储精度（默认 fp32）：
+    # fp16 以 FLOAT16_VECTOR 存储，向量传输与索引内存减半，cosine 召回率约下降 1%；
+    # int8 仍以 FP32 写入，但索引改用 IVF_SQ8 在 Milvus 内做 8 位标量量化，召回率约下降 2%
+    # （pymilvus 2.4 没有 int8 向量字段；Milvus Lite 不支持 IVF_SQ8，只能连接 Milvus 服务时使用）
+    "vector_precisions": {
+        "fp32": "FLOAT_VECTOR",
+        "fp16": "FLOAT16_VECTOR",
+        "int8": "FLOAT_VECTOR"
     }
-} 
\ No newline at end of file
+}
+
+# 未指定或未知索引模式时的默认索引：连接 Milvus 服务时使用 HNSW，
+# Milvus Lite（本地 .db 文件）只支持 FLAT / IVF_FLAT / AUTOINDEX，此时使用 FLAT
+MILVUS_CONFIG["default_index_mode"] = "flat" if MILVUS_CONFIG["uri"].endswith(".db") else "hnsw"
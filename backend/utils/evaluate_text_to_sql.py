@@ -1,112 +1,105 @@
+import argparse
+import asyncio
 import os
-from openai import OpenAI
+from concurrent.futures import ProcessPoolExecutor
+from openai import AsyncOpenAI
 import json
 import random
 import re
 import math
 import difflib
+import copy
+import functools
 from collections import Counter
-client = OpenAI(
-    base_url="https://api.deepseek.com",
-    api_key=os.getenv("DEEPSEEK_API_KEY")
-)
+try:
+    from rapidfuzz.distance import Indel
+except ImportError:  # rapidfuzz 不可用时回退到 difflib
+    Indel = None
+try:
+    import numpy as np
+except ImportError:  # numpy 不可用时 LCS 的 DP 分支始终使用纯 Python 实现
+    np = None
+try:
+    import orjson
+except ImportError:  # orjson 不可用时回退到标准库 json
+    orjson = None
+try:
+    import ijson
+    IJSON_AVAILABLE = True
+except Exception:
+    ijson = None
+    IJSON_AVAILABLE = False
 
-# 从 JSON 文件读取自然语言查询，默认文件位于与当前脚本同目录下的 query.json
-json_path = '../data/q2sql_pairs.json'
+# SQL 标准化与分词用到的正则，模块加载时编译一次
+_FENCE_RE = re.compile(r"```.*?```", re.S)
+_LINE_COMMENT_RE = re.compile(r"--.*?$", re.M)      # single-line comments
+_BLOCK_COMMENT_RE = re.compile(r"/\*.*?\*/", re.S)   # block comments
+_WS_RE = re.compile(r"\s+")
+_TOK_RE = re.compile(r"\w+|\S")
+# 去掉反引号和双引号，分号替换为空格
+_TRANS = str.maketrans({"`": None, '"': None, ";": " "})
 
-try:
-    with open(json_path, "r", encoding="utf-8") as f:
-        data = json.load(f)
-    # 从读取到的 data 中随机选取一个条目，并尝试提取问题和答案字段
-    selected = None
-    question = None
-    answer = None
+# DeepSeek 接口配置；批量生成时同时在途的请求数上限
+DEEPSEEK_BASE_URL = "https://api.deepseek.com"
+MAX_CONCURRENCY = 16
 
-    if isinstance(data, list) and data:
-        selected = random.choice(data)
-        question = selected.get("question") or selected.get("query") or selected.get("nl_query")
-        answer = selected.get("sql") or selected.get("sql_query")
-    else:
-        raise ValueError("JSON 文件内容不是预期的列表格式或为空") 
+# SQL 对数量达到该值时才用多进程计算指标，数据量小时进程启动与通信开销得不偿失
+PARALLEL_MIN_PAIRS = 64
 
-    user_query = str(question)
-    print(f"随机选择的问题：{user_query}")
-    if answer:
-        print(f"对应的答案：{answer}")
-except Exception as e:
-    user_query = ""
-    print(f"无法读取 JSON 文件 ({json_path})：{e}")
-    exit
-    
+# 从 JSON 文件读取自然语言查询，默认文件位于与当前脚本同目录下的 query.json
+json_path = '../data/q2sql_pairs.json'
 
 # 准备生成SQL的提示词
-prompt = f"""
+PROMPT_TEMPLATE = """
 用户的自然语言问题如下：
 "{user_query}"
 请注意：
 请只返回SQL查询语句，不要包含任何其他解释、注释或格式标记（如```sql）
 """
 
-# print(f"\n生成SQL的提示词：\n{prompt}")
-
-# 调用LLM生成SQL语句
-response = client.chat.completions.create(
-    model="deepseek-chat",
-    messages=[
-        {"role": "system", "content": "你是一个SQL专家。请只返回SQL查询语句，不要包含任何Markdown格式或其他说明。"},
-        {"role": "user", "content": prompt}
-    ],
-    temperature=0
-)
-# print(f"\n完整的LLM响应：\n{response}")
-# 清理SQL语句，移除可能的Markdown标记
-sql = response.choices[0].message.content.strip()
-# sql = sql.replace('```sql', '').replace('```', '').strip()
-print(f"\n生成的SQL查询语句：\n{sql}")
-
 
 def normalize_sql(s: str) -> str:
     if not s:
         return ""
     # remove possible markdown code fences and SQL comments, lowercase, collapse whitespace
-    s = re.sub(r"```.*?```", "", s, flags=re.S)
-    s = re.sub(r"--.*?$", "", s, flags=re.M)      # single-line comments
-    s = re.sub(r"/\*.*?\*/", "", s, flags=re.S)   # block comments
-    s = s.replace("`", "").replace('"', "").replace(";", " ")
+    s = _FENCE_RE.sub("", s)
+    s = _LINE_COMMENT_RE.sub("", s)
+    s = _BLOCK_COMMENT_RE.sub("", s)
+    s = s.translate(_TRANS)
     s = s.lower()
-    s = re.sub(r"\s+", " ", s).strip()
+    s = _WS_RE.sub(" ", s).strip()
     return s
 
 def tokenize_sql(s: str):
     # simple SQL tokenizer: words, numbers, operators, parentheses, commas, dots
     if not s:
         return []
-    return re.findall(r"\w+|\S", s)
+    return _TOK_RE.findall(s)
 
 def ngrams(tokens, n):
-    return [" ".join(tokens[i:i+n]) for i in range(len(tokens)-n+1)] if len(tokens)>=n else []
-
-def modified_precision(candidate_tokens, reference_tokens, n):
-    cand_ngrams = ngrams(candidate_tokens, n)
-    ref_ngrams = ngrams(reference_tokens, n)
-    if not cand_ngrams:
-        return 0.0, 0, 0
-    cand_counts = Counter(cand_ngrams)
-    ref_counts = Counter(ref_ngrams)
-    overlap = sum(min(count, ref_counts[ng]) for ng, count in cand_counts.items())
-    return overlap / len(cand_ngrams), overlap, len(cand_ngrams)
+    # tuple n-grams straight from shifted views of the token list, no string joins
+    return zip(*(tokens[i:] for i in range(n)))
+
+def all_ngrams(tokens, max_n):
+    # n-gram counters for n = 1..max_n, built together for one token sequence
+    return [Counter(ngrams(tokens, n)) for n in range(1, max_n+1)]
 
 def bleu(candidate_tokens, reference_tokens, max_n=4):
     precisions = []
     matches = []
     totals = []
-    for n in range(1, max_n+1):
-        p, m, t = modified_precision(candidate_tokens, reference_tokens, n)
+    cand_counters = all_ngrams(candidate_tokens, max_n)
+    ref_counters = all_ngrams(reference_tokens, max_n)
+    for n, cand_counts, ref_counts in zip(range(1, max_n+1), cand_counters, ref_counters):
+        t = max(len(candidate_tokens) - n + 1, 0)
+        # clipped counts: Counter intersection keeps min(candidate, reference) per n-gram
+        m = sum((cand_counts & ref_counts).values())
+        p = m / t if t else 0.0
         precisions.append(p if p > 0 else 1e-16)  # avoid log(0)
         matches.append(m)
         totals.append(t)
     # geometric mean of precisions
-    log_prec_sum = sum((1.0/max_n) * math.log(p) for p in precisions)
+    log_prec_sum = math.fsum((1.0/max_n) * math.log(p) for p in precisions)
     geo_mean = math.exp(log_prec_sum)
     c = len(candidate_tokens)
     r = len(reference_tokens)
@@ -114,22 +107,92 @@ def bleu(candidate_tokens, reference_tokens, max_n=4):
     score = bp * geo_mean
     return score, {"matches": matches, "totals": totals, "bp": bp}
 
+# 两个 token 序列长度之积低于该值时直接用 DP，小输入上位并行算法的大整数开销不划算
+_LCS_BITSET_MIN_CELLS = 4096
+
+# 批量评测的工作进程中启用的 numba 编译版 LCS 内核；为 None 时小输入走纯 Python DP
+_compiled_lcs = None
+
 def lcs_length(a, b):
-    # classic DP for LCS length
     la, lb = len(a), len(b)
     if la == 0 or lb == 0:
         return 0
-    dp = [0] * (lb + 1)
-    for i in range(la-1, -1, -1):
-        newdp = [0] * (lb + 1)
-        for j in range(lb-1, -1, -1):
-            if a[i] == b[j]:
-                newdp[j] = 1 + dp[j+1]
+    if la * lb < _LCS_BITSET_MIN_CELLS:
+        if _compiled_lcs is not None:
+            return int(_compiled_lcs(*_encode_tokens(a, b)))
+        return _lcs_length_dp(a, b)
+    # bit-parallel LCS (Allison-Dix / Hyyro): Python ints serve as bitsets over b,
+    # so each token of a costs a handful of bignum ops instead of an O(lb) Python loop
+    masks = {}
+    for j, t in enumerate(b):
+        masks[t] = masks.get(t, 0) | (1 << j)
+    v = 0
+    for t in a:
+        x = v | masks.get(t, 0)
+        v = x & (x ^ (x - ((v << 1) | 1)))
+    return bin(v).count("1")
+
+def _lcs_length_dp(a, b):
+    # classic DP for LCS length in linear space: iterate over the longer sequence
+    # and keep two preallocated rows sized by the shorter one, swapped in place
+    if len(a) > len(b):
+        a, b = b, a
+    la = len(a)
+    dp = [0] * (la + 1)
+    newdp = [0] * (la + 1)
+    for j in range(len(b)-1, -1, -1):
+        bj = b[j]
+        for i in range(la-1, -1, -1):
+            if a[i] == bj:
+                newdp[i] = 1 + dp[i+1]
             else:
-                newdp[j] = max(dp[j], newdp[j+1])
-        dp = newdp
+                newdp[i] = max(dp[i], newdp[i+1])
+        dp, newdp = newdp, dp
     return dp[0]
 
+def _encode_tokens(a, b):
+    # 按出现顺序把 token 映射为小整数 ID，只在 b 中出现的 token 记为 -1（不会与 a 匹配）
+    vocab = {}
+    a_ids = np.fromiter((vocab.setdefault(t, len(vocab)) for t in a), dtype=np.int32, count=len(a))
+    b_ids = np.fromiter((vocab.get(t, -1) for t in b), dtype=np.int32, count=len(b))
+    return a_ids, b_ids
+
+def _lcs_length_ids(a, b):
+    # same two-row DP as _lcs_length_dp over int32 token IDs; compiled by _load_lcs_kernel
+    if a.shape[0] > b.shape[0]:
+        a, b = b, a
+    la = a.shape[0]
+    dp = np.zeros(la + 1, dtype=np.int32)
+    newdp = np.zeros(la + 1, dtype=np.int32)
+    for j in range(b.shape[0]-1, -1, -1):
+        bj = b[j]
+        for i in range(la-1, -1, -1):
+            if a[i] == bj:
+                newdp[i] = 1 + dp[i+1]
+            else:
+                newdp[i] = max(dp[i], newdp[i+1])
+        dp, newdp = newdp, dp
+    return dp[0]
+
+@functools.lru_cache(maxsize=1)
+def _load_lcs_kernel():
+    """
+    导入 numba 并编译 _lcs_length_ids，numba 不可用时返回 None
+    导入与 JIT（或读取缓存）需要一秒以上，单条评测的 DP 只要几十微秒，因此只在批量评测时调用
+    """
+    if np is None:
+        return None
+    try:
+        import numba
+    except ImportError:
+        return None
+    return numba.njit(cache=True)(_lcs_length_ids)
+
+def _enable_compiled_lcs():
+    # 进程池 initializer：在工作进程中启用编译版 LCS 内核
+    global _compiled_lcs
+    _compiled_lcs = _load_lcs_kernel()
+
 def rouge_l(candidate_tokens, reference_tokens):
     lcs = lcs_length(candidate_tokens, reference_tokens)
     cand_len = len(candidate_tokens)
@@ -145,49 +208,211 @@ def rouge_l(candidate_tokens, reference_tokens):
 def token_overlap(candidate_tokens, reference_tokens):
     cand_counts = Counter(candidate_tokens)
     ref_counts = Counter(reference_tokens)
-    overlap = sum(min(cand_counts[t], ref_counts[t]) for t in cand_counts)
-    prec = overlap / sum(cand_counts.values()) if cand_counts else 0.0
-    rec = overlap / sum(ref_counts.values()) if ref_counts else 0.0
+    # multiset intersection keeps min(candidate, reference) per token
+    overlap = sum((cand_counts & ref_counts).values())
+    prec = overlap / len(candidate_tokens) if candidate_tokens else 0.0
+    rec = overlap / len(reference_tokens) if reference_tokens else 0.0
     f1 = (2 * prec * rec) / (prec + rec) if (prec + rec) else 0.0
     return {"overlap": overlap, "precision": prec, "recall": rec, "f1": f1}
 
-def evaluate_sql(candidate_sql: str, reference_sql: str):
-    cand_norm = normalize_sql(candidate_sql)
-    ref_norm = normalize_sql(reference_sql)
-    cand_tokens = tokenize_sql(cand_norm)
-    ref_tokens = tokenize_sql(ref_norm)
+def sequence_ratio(a: str, b: str) -> float:
+    # 2 * matches / total length; rapidfuzz computes it with the exact LCS in C++,
+    # difflib's Ratcliff-Obershelp matching (greedy, with autojunk) can score lower on long strings
+    if Indel is not None:
+        return Indel.normalized_similarity(a, b)
+    return difflib.SequenceMatcher(None, a, b).ratio()
+
+# 评测缓存容量上限：批量评测时同一条参考 SQL / 候选 SQL 会反复出现，
+# 标准化与分词结果按单条 SQL 缓存（最多 4096 条），指标按标准化后的 SQL 对缓存（最多 1024 对），
+# 内存占用随 maxsize 线性增长
+@functools.lru_cache(maxsize=4096)
+def _normalize_cached(s: str) -> str:
+    return normalize_sql(s)
+
+@functools.lru_cache(maxsize=4096)
+def _tokenize_cached(s: str) -> tuple:
+    # tuple so the tokens can be shared between cache entries safely
+    return tuple(tokenize_sql(s))
+
+# 评测使用的 BLEU 最大 n-gram 阶数
+_BLEU_MAX_N = 4
+
+@functools.lru_cache(maxsize=1024)
+def _eval_pair(cand_norm: str, ref_norm: str):
+    # 返回的字典由缓存共享，只能通过 evaluate_sql 拿到其副本
+    cand_tokens = _tokenize_cached(cand_norm)
+    ref_tokens = _tokenize_cached(ref_norm)
 
     results = {}
     results["candidate_normalized"] = cand_norm
     results["reference_normalized"] = ref_norm
     results["exact_match"] = cand_norm == ref_norm
-    results["sequence_ratio"] = difflib.SequenceMatcher(None, cand_norm, ref_norm).ratio()
+    if results["exact_match"] and len(cand_tokens) >= _BLEU_MAX_N:
+        # 完全一致时各指标都能直接写出；少于 max_n 个 token 时 BLEU 的高阶精度为 0，仍走完整计算
+        n = len(cand_tokens)
+        counts = [n - i for i in range(_BLEU_MAX_N)]
+        results["sequence_ratio"] = 1.0
+        results["token_count"] = {"candidate": n, "reference": n}
+        results["token_overlap"] = {"overlap": n, "precision": 1.0, "recall": 1.0, "f1": 1.0}
+        results["bleu"] = {"score": 1.0, "matches": counts, "totals": list(counts), "bp": 1.0}
+        results["rouge_l"] = {"lcs": n, "precision": 1.0, "recall": 1.0, "f1": 1.0}
+        return results
+    results["sequence_ratio"] = sequence_ratio(cand_norm, ref_norm)
     results["token_count"] = {"candidate": len(cand_tokens), "reference": len(ref_tokens)}
     results["token_overlap"] = token_overlap(cand_tokens, ref_tokens)
-    bleu_score, bleu_info = bleu(cand_tokens, ref_tokens, max_n=4)
+    bleu_score, bleu_info = bleu(cand_tokens, ref_tokens, max_n=_BLEU_MAX_N)
     results["bleu"] = {"score": bleu_score, **bleu_info}
     results["rouge_l"] = rouge_l(cand_tokens, ref_tokens)
     return results
 
-# prepare inputs (answer may be None or already a dict/list)
-reference_sql = answer if isinstance(answer, str) else (json.dumps(answer, ensure_ascii=False) if answer is not None else "")
-candidate_sql = sql if isinstance(sql, str) else (json.dumps(sql, ensure_ascii=False) if sql is not None else "")
+def evaluate_sql(candidate_sql: str, reference_sql: str):
+    # 返回缓存结果的深拷贝（含嵌套的 bleu / rouge_l 等字典），调用方修改不会影响之后的结果
+    return copy.deepcopy(_eval_pair(_normalize_cached(candidate_sql), _normalize_cached(reference_sql)))
+
+def evaluate_sql_pair(pair):
+    # 顶层函数，便于 ProcessPoolExecutor 序列化
+    return evaluate_sql(*pair)
+
+def evaluate_pairs(pairs, max_workers=None):
+    """
+    批量计算 (候选 SQL, 参考 SQL) 的指标：正则、BLEU、LCS 均为纯 Python 计算，受 GIL 限制，
+    数据量较大时分发到多进程；chunksize 取 len/(4*进程数)，摊薄每个任务的进程间通信开销。
+    工作进程启动时启用 numba 编译的 LCS 内核（已安装 numba 时），一次性开销由大量 SQL 对分摊
+    """
+    if len(pairs) < PARALLEL_MIN_PAIRS:
+        return [evaluate_sql_pair(pair) for pair in pairs]
+    workers = max_workers or os.cpu_count() or 1
+    chunksize = max(1, len(pairs) // (4 * workers))
+    with ProcessPoolExecutor(max_workers=workers, initializer=_enable_compiled_lcs) as executor:
+        return list(executor.map(evaluate_sql_pair, pairs, chunksize=chunksize))
+
+def load_items(path):
+    # 读取整个数据集（批量评估需要全部条目）
+    if orjson is not None:
+        with open(path, "rb") as f:
+            data = orjson.loads(f.read())
+    else:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    if not isinstance(data, list) or not data:
+        raise ValueError("JSON 文件内容不是预期的列表格式或为空")
+    return data
+
+def sample_item(path):
+    """
+    从数据集中随机抽取一条记录：ijson 流式解析并做蓄水池抽样，
+    只需顺序读一遍文件，不会把全部条目构造成 Python 对象
+    """
+    if not IJSON_AVAILABLE:
+        return random.choice(load_items(path))
+    selected = None
+    with open(path, "rb") as f:
+        for i, item in enumerate(ijson.items(f, "item", use_float=True)):
+            # 第 i 条以 1/(i+1) 的概率替换当前样本，最终每条被选中的概率相同
+            if random.randrange(i + 1) == 0:
+                selected = item
+    if selected is None:
+        raise ValueError("JSON 文件内容不是预期的列表格式或为空")
+    return selected
+
+def extract_pair(item):
+    # 从数据集条目中提取问题和答案字段
+    question = item.get("question") or item.get("query") or item.get("nl_query")
+    answer = item.get("sql") or item.get("sql_query")
+    return question, answer
+
+def as_sql_text(value) -> str:
+    # answer / sql may be None or already a dict/list
+    return value if isinstance(value, str) else (json.dumps(value, ensure_ascii=False) if value is not None else "")
+
+async def gen_sql(aclient, question, sem):
+    # 调用LLM生成SQL语句，信号量限制同时在途的请求数
+    async with sem:
+        response = await aclient.chat.completions.create(
+            model="deepseek-chat",
+            messages=[
+                {"role": "system", "content": "你是一个SQL专家。请只返回SQL查询语句，不要包含任何Markdown格式或其他说明。"},
+                {"role": "user", "content": PROMPT_TEMPLATE.format(user_query=question)}
+            ],
+            temperature=0
+        )
+    # 清理SQL语句，移除可能的Markdown标记
+    return response.choices[0].message.content.strip()
+
+async def generate_sqls(questions, concurrency=MAX_CONCURRENCY):
+    """
+    并发为所有问题生成 SQL：LLM 接口受网络延迟限制而非算力限制，
+    并发 N 个请求可获得接近 N 倍的吞吐（受接口限流约束）
+    """
+    aclient = AsyncOpenAI(base_url=DEEPSEEK_BASE_URL, api_key=os.getenv("DEEPSEEK_API_KEY"))
+    sem = asyncio.Semaphore(concurrency)
+    try:
+        return await asyncio.gather(*(gen_sql(aclient, q, sem) for q in questions))
+    finally:
+        await aclient.close()
+
+def print_metrics(metrics):
+    # print a concise summary
+    print("\n评价指标（越高越好，部分为比率/分数）:")
+    print(f"- Exact match: {metrics['exact_match']}")
+    print(f"- Sequence similarity (ratio): {metrics['sequence_ratio']:.4f}")
+    print(f"- BLEU-4 (BP * geom mean): {metrics['bleu']['score']:.4f}  (bp={metrics['bleu']['bp']:.4f})")
+    print(f"- ROUGE-L F1: {metrics['rouge_l']['f1']:.4f}  (LCS={metrics['rouge_l']['lcs']})")
+    to = metrics["token_overlap"]
+    print(f"- Token Overlap P/R/F1: {to['precision']:.4f} / {to['recall']:.4f} / {to['f1']:.4f}  (overlap={to['overlap']})")
+    print(f"- Candidate tokens: {metrics['token_count']['candidate']}, Reference tokens: {metrics['token_count']['reference']}")
+
+    # optionally print normalized SQLs for inspection
+    print("\n标准化后候选 SQL：")
+    print(metrics["candidate_normalized"] or "(空)")
+
+    print("\n标准化后参考 SQL：")
+    print(metrics["reference_normalized"] or "(空)")
+
+def print_summary(all_metrics):
+    # 数据集整体的平均指标
+    n = len(all_metrics)
+    print(f"\n数据集评价指标（共 {n} 条，取平均）:")
+    print(f"- Exact match: {sum(m['exact_match'] for m in all_metrics) / n:.4f}")
+    print(f"- Sequence similarity (ratio): {sum(m['sequence_ratio'] for m in all_metrics) / n:.4f}")
+    print(f"- BLEU-4: {sum(m['bleu']['score'] for m in all_metrics) / n:.4f}")
+    print(f"- ROUGE-L F1: {sum(m['rouge_l']['f1'] for m in all_metrics) / n:.4f}")
+    print(f"- Token Overlap F1: {sum(m['token_overlap']['f1'] for m in all_metrics) / n:.4f}")
+
+def main():
+    parser = argparse.ArgumentParser(description="评估 LLM 生成的 SQL 与参考 SQL 的相似度")
+    parser.add_argument("--all", action="store_true", help="评估数据集中的全部问题（默认随机抽取一条）")
+    parser.add_argument("--concurrency", type=int, default=MAX_CONCURRENCY, help="批量生成时的最大并发请求数")
+    args = parser.parse_args()
+
+    try:
+        # 批量评估读取全部条目；单条评估只流式抽取一条
+        data = load_items(json_path) if args.all else [sample_item(json_path)]
+    except Exception as e:
+        print(f"无法读取 JSON 文件 ({json_path})：{e}")
+        return
+
+    if args.all:
+        pairs = [extract_pair(item) for item in data]
+        sqls = asyncio.run(generate_sqls([str(q) for q, _ in pairs], args.concurrency))
+        all_metrics = evaluate_pairs([(as_sql_text(sql), as_sql_text(answer)) for (_, answer), sql in zip(pairs, sqls)])
+        for (question, _), metrics in zip(pairs, all_metrics):
+            print(f"- BLEU-4 {metrics['bleu']['score']:.4f}  ROUGE-L F1 {metrics['rouge_l']['f1']:.4f}  {question}")
+        print_summary(all_metrics)
+        return
+
+    # 从读取到的 data 中随机选取一个条目，并尝试提取问题和答案字段
+    question, answer = extract_pair(data[0])
+    user_query = str(question)
+    print(f"随机选择的问题：{user_query}")
+    if answer:
+        print(f"对应的答案：{answer}")
 
-metrics = evaluate_sql(candidate_sql, reference_sql)
+    sql = asyncio.run(generate_sqls([user_query]))[0]
+    print(f"\n生成的SQL查询语句：\n{sql}")
 
-# print a concise summary
-print("\n评价指标（越高越好，部分为比率/分数）:")
-print(f"- Exact match: {metrics['exact_match']}")
-print(f"- Sequence similarity (ratio): {metrics['sequence_ratio']:.4f}")
-print(f"- BLEU-4 (BP * geom mean): {metrics['bleu']['score']:.4f}  (bp={metrics['bleu']['bp']:.4f})")
-print(f"- ROUGE-L F1: {metrics['rouge_l']['f1']:.4f}  (LCS={metrics['rouge_l']['lcs']})")
-to = metrics["token_overlap"]
-print(f"- Token Overlap P/R/F1: {to['precision']:.4f} / {to['recall']:.4f} / {to['f1']:.4f}  (overlap={to['overlap']})")
-print(f"- Candidate tokens: {metrics['token_count']['candidate']}, Reference tokens: {metrics['token_count']['reference']}")
+    print_metrics(evaluate_sql(as_sql_text(sql), as_sql_text(answer)))
 
-# optionally print normalized SQLs for inspection
-print("\n标准化后候选 SQL：")
-print(metrics["candidate_normalized"] or "(空)")
 
-print("\n标准化后参考 SQL：")
-print(metrics["reference_normalized"] or "(空)")
\ No newline at end of file
+if __name__ == "__main__":
+    main()
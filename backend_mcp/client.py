@@ -3,11 +3,22 @@ import asyncio
 import json
 import sys
 import os
+import time
 from typing import Optional, Dict, Any
 import mcp
 import mcp.client.stdio
 import mcp.client.session
 from mcp.client.stdio import StdioServerParameters
+try:
+    import orjson
+except ImportError:  # orjson 不可用时回退到标准库 json
+    orjson = None
+
+# 服务器默认的统计资源 URI
+DEFAULT_STATS_URI = "rag://knowledge/stats"
+
+# 服务器脚本与本文件同目录，按文件位置解析，不依赖当前工作目录
+MCP_SERVER_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), "mcp_server.py"))
 
 class MCPRAGClient:
     """MCP RAG客户端 - 最终修复版"""
@@ -17,6 +28,19 @@ class MCPRAGClient:
             command=server_command,
             args=server_args
         )
+        # 工具/提示/资源列表很少变化，缓存 (结果, 获取时间) 以减少与服务器的往返
+        self._cache = {}
+        # 统计资源 URI：先直接读取默认 URI，失败时才通过资源列表查找并记住结果
+        self._stats_uri = DEFAULT_STATS_URI
+    
+    async def _cached(self, key: str, fetch, ttl: float = 60):
+        """返回 key 对应的缓存结果，不存在或超过 ttl 秒时调用 fetch() 重新获取"""
+        entry = self._cache.get(key)
+        if entry is not None and time.monotonic() - entry[1] < ttl:
+            return entry[0]
+        result = await fetch()
+        self._cache[key] = (result, time.monotonic())
+        return result
     
     async def run_interactive(self):
         """运行交互式客户端"""
@@ -44,7 +68,7 @@ class MCPRAGClient:
                         print("  8. 测试所有功能")
                         print("  9. 退出")
                         
-                        choice = input("\n请选择 (1-9): ").strip()
+                        choice = await self._ainput("\n请选择 (1-9): ")
                         
                         if choice == "9":
                             print("再见！")
@@ -82,13 +106,27 @@ class MCPRAGClient:
             import traceback
             traceback.print_exc()
     
+    async def _ainput(self, prompt: str) -> str:
+        """在线程中读取用户输入，避免阻塞事件循环，等待输入时仍可处理 stdio 上的服务器消息"""
+        return (await asyncio.to_thread(input, prompt)).strip()
+    
+    def _print_tool_result(self, result, prefix: str = "\n") -> bool:
+        """打印 CallToolResult 的文本内容（content 属性，单数），没有内容时返回 False"""
+        contents = getattr(result, 'content', None)
+        if not contents:
+            return False
+        for content in contents:
+            text = getattr(content, 'text', None)
+            if text is not None:
+                print(f"{prefix}{text}")
+        return True
+    
     async def _handle_list_tools(self, session):
         """处理列出工具"""
         try:
             print("\n获取工具列表...")
-            tools_result = await session.list_tools()
-            if hasattr(tools_result, 'tools'):
-                tools = tools_result.tools
+            tools_result = await self._cached("tools", session.list_tools)
+            if (tools := getattr(tools_result, 'tools', None)) is not None:
                 print(f"\n🛠️ 可用工具 ({len(tools)}):")
                 for i, tool in enumerate(tools, 1):
                     print(f"\n  {i}. {tool.name}")
@@ -100,13 +138,13 @@ class MCPRAGClient:
     
     async def _handle_search(self, session):
         """处理搜索"""
-        query = input("\n请输入搜索内容: ").strip()
+        query = await self._ainput("\n请输入搜索内容: ")
         if not query:
             print("搜索内容不能为空")
             return
         
         try:
-            top_k = input("返回结果数量 (默认3): ").strip()
+            top_k = await self._ainput("返回结果数量 (默认3): ")
             top_k = int(top_k) if top_k else 3
             
             print(f"\n🔍 搜索: '{query}' (返回 {top_k} 个结果)")
@@ -116,17 +154,8 @@ class MCPRAGClient:
                 {"query": query, "top_k": top_k}
             )
             
-            # 处理CallToolResult - 使用content属性（单数）
-            if hasattr(result, 'content'):
-                contents = result.content
-                if contents:
-                    for content in contents:
-                        if hasattr(content, 'text'):
-                            print(f"\n{content.text}")
-                else:
-                    print("没有找到相关结果")
-            else:
-                print(f"搜索结果格式错误，返回类型: {type(result)}")
+            if not self._print_tool_result(result):
+                print("没有找到相关结果")
                 
         except ValueError:
             print("请输入有效的数字")
@@ -136,13 +165,13 @@ class MCPRAGClient:
     async def _handle_add_knowledge(self, session):
         """处理添加知识"""
         print("\n📝 添加新知识到知识库")
-        text = input("请输入文本: ").strip()
+        text = await self._ainput("请输入文本: ")
         if not text:
             print("文本不能为空")
             return
         
-        source = input("来源 (可选): ").strip() or "user_input"
-        category = input("分类 (可选): ").strip() or ""
+        source = await self._ainput("来源 (可选): ") or "user_input"
+        category = await self._ainput("分类 (可选): ") or ""
         
         try:
             arguments = {"text": text, "source": source}
@@ -157,30 +186,21 @@ class MCPRAGClient:
             
             result = await session.call_tool("add_to_knowledge", arguments)
             
-            # 处理CallToolResult - 使用content属性（单数）
-            if hasattr(result, 'content'):
-                contents = result.content
-                if contents:
-                    for content in contents:
-                        if hasattr(content, 'text'):
-                            print(f"\n✅ {content.text}")
-                else:
-                    print("添加失败，无返回结果")
-            else:
-                print(f"添加结果格式错误，返回类型: {type(result)}")
+            if not self._print_tool_result(result, prefix="\n✅ "):
+                print("添加失败，无返回结果")
                 
         except Exception as e:
             print(f"添加失败: {e}")
     
     async def _handle_ask_question(self, session):
         """处理提问"""
-        question = input("\n请输入问题: ").strip()
+        question = await self._ainput("\n请输入问题: ")
         if not question:
             print("问题不能为空")
             return
         
         try:
-            include_context = input("包含上下文来源? (y/n, 默认y): ").strip().lower()
+            include_context = (await self._ainput("包含上下文来源? (y/n, 默认y): ")).lower()
             include_context = include_context != 'n'
             
             print(f"\n🤖 正在回答问题: '{question}'")
@@ -195,17 +215,8 @@ class MCPRAGClient:
                 }
             )
             
-            # 处理CallToolResult - 使用content属性（单数）
-            if hasattr(result, 'content'):
-                contents = result.content
-                if contents:
-                    for content in contents:
-                        if hasattr(content, 'text'):
-                            print(f"\n{content.text}")
-                else:
-                    print("无法回答问题")
-            else:
-                print(f"回答结果格式错误，返回类型: {type(result)}")
+            if not self._print_tool_result(result):
+                print("无法回答问题")
                 
         except Exception as e:
             print(f"提问失败: {e}")
@@ -214,53 +225,52 @@ class MCPRAGClient:
         """处理显示统计"""
         try:
             print("\n📊 获取知识库统计...")
+            print(f"读取资源: {self._stats_uri}")
+            try:
+                result = await session.read_resource(self._stats_uri)
+            except Exception:
+                stats_uri = await self._find_stats_uri(session)
+                if not stats_uri or stats_uri == self._stats_uri:
+                    raise
+                self._stats_uri = stats_uri
+                print(f"读取资源: {stats_uri}")
+                result = await session.read_resource(stats_uri)
             
-            resources_result = await session.list_resources()
-            if not hasattr(resources_result, 'resources'):
-                print("资源列表格式错误")
+            contents = getattr(result, 'contents', None)
+            if not contents:
+                print("未找到统计信息")
                 return
-            
-            resources = resources_result.resources
-            
-            # 查找统计资源
-            stats_uri = None
-            for resource in resources:
-                if "stats" in resource.name.lower() or "统计" in resource.name:
-                    stats_uri = resource.uri
-                    break
-            
-            if not stats_uri:
-                stats_uri = "rag://knowledge/stats"
-            
-            print(f"读取资源: {stats_uri}")
-            
-            result = await session.read_resource(stats_uri)
-            
-            if hasattr(result, 'contents'):
-                contents = result.contents
-                if contents:
-                    for content in contents:
-                        if hasattr(content, 'text'):
-                            try:
-                                stats = json.loads(content.text)
-                                print(json.dumps(stats, indent=2, ensure_ascii=False))
-                            except json.JSONDecodeError:
-                                print(content.text)
-                else:
-                    print("未找到统计信息")
-            else:
-                print("统计结果格式错误")
+            for content in contents:
+                text = getattr(content, 'text', None)
+                if text is not None:
+                    try:
+                        if orjson is not None:
+                            # orjson.JSONDecodeError 是 json.JSONDecodeError 的子类
+                            stats = orjson.loads(text)
+                            print(orjson.dumps(stats, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS).decode())
+                        else:
+                            stats = json.loads(text)
+                            print(json.dumps(stats, indent=2, ensure_ascii=False))
+                    except json.JSONDecodeError:
+                        print(text)
                 
         except Exception as e:
             print(f"获取统计失败: {e}")
     
+    async def _find_stats_uri(self, session) -> Optional[str]:
+        """从资源列表中查找统计资源的 URI"""
+        resources_result = await self._cached("resources", session.list_resources)
+        for resource in getattr(resources_result, 'resources', None) or []:
+            if "stats" in resource.name.lower() or "统计" in resource.name:
+                return str(resource.uri)
+        return None
+    
     async def _handle_list_prompts(self, session):
         """处理列出提示"""
         try:
             print("\n获取提示模板列表...")
-            prompts_result = await session.list_prompts()
-            if hasattr(prompts_result, 'prompts'):
-                prompts = prompts_result.prompts
+            prompts_result = await self._cached("prompts", session.list_prompts)
+            if (prompts := getattr(prompts_result, 'prompts', None)) is not None:
                 print(f"\n💡 提示模板 ({len(prompts)}):")
                 for i, prompt in enumerate(prompts, 1):
                     print(f"\n  {i}. {prompt.name}")
@@ -274,9 +284,8 @@ class MCPRAGClient:
         """处理列出资源"""
         try:
             print("\n获取资源列表...")
-            resources_result = await session.list_resources()
-            if hasattr(resources_result, 'resources'):
-                resources = resources_result.resources
+            resources_result = await self._cached("resources", session.list_resources)
+            if (resources := getattr(resources_result, 'resources', None)) is not None:
                 print(f"\n📚 资源 ({len(resources)}):")
                 for i, resource in enumerate(resources, 1):
                     print(f"\n  {i}. {resource.name}")
@@ -296,9 +305,8 @@ class MCPRAGClient:
         try:
             # 1. 测试工具
             print("\n1. 测试工具功能...")
-            tools_result = await session.list_tools()
-            if hasattr(tools_result, 'tools'):
-                tools = tools_result.tools
+            tools_result = await self._cached("tools", session.list_tools)
+            if (tools := getattr(tools_result, 'tools', None)) is not None:
                 print(f"   找到 {len(tools)} 个工具")
             
             # 2. 测试搜索
@@ -307,8 +315,7 @@ class MCPRAGClient:
                 "search_knowledge",
                 {"query": "测试", "top_k": 2}
             )
-            if hasattr(search_result, 'content'):
-                contents = search_result.content
+            if (contents := getattr(search_result, 'content', None)) is not None:
                 print(f"   搜索完成，返回 {len(contents)} 个结果")
             
             # 3. 测试添加
@@ -321,10 +328,8 @@ class MCPRAGClient:
                     "category": "test"
                 }
             )
-            if hasattr(add_result, 'content'):
-                contents = add_result.content
-                if contents:
-                    print(f"   添加完成: {contents[0].text}")
+            if contents := getattr(add_result, 'content', None):
+                print(f"   添加完成: {contents[0].text}")
             
             # 4. 测试提问
             print("\n4. 测试提问功能...")
@@ -332,23 +337,19 @@ class MCPRAGClient:
                 "rag_query",
                 {"question": "什么是测试?", "include_context": False}
             )
-            if hasattr(ask_result, 'content'):
-                contents = ask_result.content
-                if contents:
-                    print(f"   提问完成，回答长度: {len(contents[0].text)}")
+            if contents := getattr(ask_result, 'content', None):
+                print(f"   提问完成，回答长度: {len(contents[0].text)}")
             
             # 5. 测试提示
             print("\n5. 测试提示功能...")
-            prompts_result = await session.list_prompts()
-            if hasattr(prompts_result, 'prompts'):
-                prompts = prompts_result.prompts
+            prompts_result = await self._cached("prompts", session.list_prompts)
+            if (prompts := getattr(prompts_result, 'prompts', None)) is not None:
                 print(f"   找到 {len(prompts)} 个提示模板")
             
             # 6. 测试资源
             print("\n6. 测试资源功能...")
-            resources_result = await session.list_resources()
-            if hasattr(resources_result, 'resources'):
-                resources = resources_result.resources
+            resources_result = await self._cached("resources", session.list_resources)
+            if (resources := getattr(resources_result, 'resources', None)) is not None:
                 print(f"   找到 {len(resources)} 个资源")
             
             print("\n" + "="*60)
@@ -367,7 +368,7 @@ async def main():
     
     # 获取当前Python解释器和脚本路径
     python_exe = sys.executable
-    server_script = os.path.abspath("mcp_server.py")
+    server_script = MCP_SERVER_PATH
     
     print(f"Python解释器: {python_exe}")
     print(f"服务器脚本: {server_script}")
@@ -1,6 +1,7 @@
 # config.py
+import functools
 import os
-from typing import Optional
+from typing import Any, Dict, Optional
 from dataclasses import dataclass
 
 @dataclass
@@ -16,17 +17,50 @@ class Config:
     # 向量模型配置
     embedding_model: str = "all-MiniLM-L6-v2"
     embedding_dim: int = 384
+    # 向量模型运行设备（如 "cpu"、"cuda"），None 表示由 sentence-transformers 自动选择
+    embedding_device: Optional[str] = None
+    # 向量模型推理加速：CUDA 上转为 FP16，CPU 上对 Linear 层做 int8 动态量化（向量会有细微偏差）
+    embedding_quantize: bool = False
+    # 文档向量的持久化缓存（SQLite 文件），重复导入相同文本时跳过编码；空字符串表示关闭
+    embedding_cache_path: str = "./embedding_cache.db"
+    # 向量缓存的模糊匹配阈值（字符 5-gram 的 Jaccard 相似度，需安装 datasketch），0 表示只做规范化后的精确匹配
+    embedding_cache_fuzzy_threshold: float = 0.98
+    # 向量存储精度: "fp16"（FLOAT16_VECTOR，内存与磁盘占用减半）或 "fp32"（FLOAT_VECTOR）
+    embedding_dtype: str = "fp16"
     
     # 集合配置
     collection_name: str = "mcp_rag_docs"
+    # 批量写入时每批的文档数（每批一次批量编码 + 一次插入）
+    insert_batch_size: int = 256
+    
+    # 语义查询缓存：最多缓存的查询数（0 表示关闭），相近查询命中所需的余弦相似度阈值
+    search_cache_size: int = 512
+    search_cache_threshold: float = 0.97
+    # 缓存结果的有效期（秒），0 表示只在本进程写入/清空时失效
+    search_cache_ttl: float = 300.0
     
     @classmethod
     def from_env(cls):
-        """从环境变量加载配置"""
-        return cls(
-            mcp_host=os.getenv("MCP_HOST", "localhost"),
-            mcp_port=int(os.getenv("MCP_PORT", "8000")),
-            milvus_db_path=os.getenv("MILVUS_DB_PATH", "./milvus_data.db"),
-            embedding_model=os.getenv("EMBEDDING_MODEL", "all-MiniLM-L6-v2"),
-            collection_name=os.getenv("COLLECTION_NAME", "mcp_rag_docs")
-        )
\ No newline at end of file
+        """从环境变量加载配置（环境变量只解析一次，进程内再修改不会生效；每次返回新实例，调用方修改互不影响）"""
+        return cls(**_env_settings())
+
+
+@functools.lru_cache(maxsize=1)
+def _env_settings() -> Dict[str, Any]:
+    """解析环境变量得到的配置字段，只解析一次（返回值共享，不要修改）"""
+    return dict(
+        mcp_host=os.getenv("MCP_HOST", "localhost"),
+        mcp_port=int(os.getenv("MCP_PORT", "8000")),
+        milvus_db_path=os.getenv("MILVUS_DB_PATH", "./milvus_data.db"),
+        embedding_model=os.getenv("EMBEDDING_MODEL", "all-MiniLM-L6-v2"),
+        embedding_device=os.getenv("EMBEDDING_DEVICE") or None,
+        embedding_quantize=os.getenv("EMBEDDING_QUANTIZE", "false").lower() in ("1", "true", "yes"),
+        embedding_dtype=os.getenv("EMBEDDING_DTYPE", "fp16"),
+        embedding_cache_path=os.getenv("EMBEDDING_CACHE_PATH", "./embedding_cache.db"),
+        embedding_cache_fuzzy_threshold=float(os.getenv("EMBEDDING_CACHE_FUZZY_THRESHOLD", "0.98")),
+        collection_name=os.getenv("COLLECTION_NAME", "mcp_rag_docs"),
+        insert_batch_size=int(os.getenv("INSERT_BATCH_SIZE", "256")),
+        search_cache_size=int(os.getenv("SEARCH_CACHE_SIZE", "512")),
+        search_cache_threshold=float(os.getenv("SEARCH_CACHE_THRESHOLD", "0.97")),
+        search_cache_ttl=float(os.getenv("SEARCH_CACHE_TTL", "300"))
+    )
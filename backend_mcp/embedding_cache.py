@@ -0,0 +1,196 @@
+# embedding_cache.py
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import unicodedata
+from typing import Dict, List, Optional
+
+import numpy as np
+
+try:
+    from datasketch import MinHash, MinHashLSH
+except ImportError:  # datasketch 不可用时只做规范化后的精确匹配
+    MinHash = MinHashLSH = None
+
+logger = logging.getLogger(__name__)
+
+# SQLite 单条语句的参数个数有上限，批量查询时分段
+_SQLITE_MAX_PARAMS = 500
+
+# 模糊匹配：按字符 5-gram 计算 MinHash，Jaccard 相似度不低于阈值时复用已有向量；过短的文本不参与
+_MINHASH_PERM = 128
+_SHINGLE_SIZE = 5
+_FUZZY_MIN_LENGTH = 32
+
+def normalize_text(text: str) -> str:
+    """NFKC 规范化、转小写并合并空白；只适用于不区分大小写、按空白切分的模型（如 all-MiniLM-L6-v2）"""
+    return " ".join(unicodedata.normalize("NFKC", text).lower().split())
+
+def _key_text(text: str, normalize: bool) -> str:
+    """参与哈希和 MinHash 的文本：区分大小写/空白的模型使用原文"""
+    return normalize_text(text) if normalize else text
+
+def _model_key(model_id: str, normalize: bool) -> str:
+    """缓存条目的模型键，包含文本规范化方式，两种方式的条目互不命中"""
+    return f"{model_id}|{'nfkc-lower' if normalize else 'exact'}"
+
+class EmbeddingCache:
+    """
+    持久化的文档向量缓存：按 (文本哈希, 模型键) 存储 float32 向量，重启后重复导入相同文本无需重新编码
+    normalize=True 时按规范化后的文本计算哈希（调用方需确认模型不区分大小写和空白），否则按原文
+    """
+
+    def __init__(self, path: str, fuzzy_threshold: float = 0.98):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        # 模糊匹配阈值；为 0 或未安装 datasketch 时关闭
+        self.fuzzy_threshold = fuzzy_threshold if MinHash is not None else 0
+        self._lock = threading.Lock()
+        # MCP 服务器在线程池中调用，连接跨线程共享，由锁保证串行访问
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "hash BLOB NOT NULL, model TEXT NOT NULL, dim INTEGER NOT NULL, vec BLOB NOT NULL, "
+            "PRIMARY KEY (hash, model))"
+        )
+        # MinHash 签名按模型键存放，只在同一模型（及规范化方式）的条目之间做模糊匹配；
+        # 旧版本的签名表没有 model 列，无法归属到模型，直接丢弃
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(signatures)")]
+        if columns and "model" not in columns:
+            self._conn.execute("DROP TABLE signatures")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS signatures ("
+            "hash BLOB NOT NULL, model TEXT NOT NULL, sig BLOB NOT NULL, PRIMARY KEY (hash, model))"
+        )
+        self._conn.commit()
+        # 模糊匹配索引，按模型键分别构建，第一次需要时才从 signatures 表加载
+        self._lsh = {}  # 模型键 -> MinHashLSH
+        self._signatures = {}  # 模型键 -> {文本哈希: MinHash}
+        # 空白 MinHash 模板；复制模板比每次重新生成置换参数快得多
+        self._minhash_template = MinHash(num_perm=_MINHASH_PERM) if self.fuzzy_threshold else None
+
+    @staticmethod
+    def text_hash(text: str, normalize: bool = False) -> bytes:
+        """文本（normalize=True 时为规范化后的文本）的 16 字节哈希"""
+        return hashlib.blake2b(_key_text(text, normalize).encode("utf-8"), digest_size=16).digest()
+
+    def _minhash(self, text: str, normalize: bool) -> Optional["MinHash"]:
+        key_text = _key_text(text, normalize)
+        if len(key_text) < _FUZZY_MIN_LENGTH:
+            return None
+        minhash = self._minhash_template.copy()
+        minhash.update_batch([
+            key_text[i:i + _SHINGLE_SIZE].encode("utf-8")
+            for i in range(len(key_text) - _SHINGLE_SIZE + 1)
+        ])
+        return minhash
+
+    def _ensure_lsh(self, model_key: str) -> "MinHashLSH":
+        """构建并返回该模型键的 LSH 索引（调用方需持有锁）"""
+        lsh = self._lsh.get(model_key)
+        if lsh is not None:
+            return lsh
+        lsh = self._lsh[model_key] = MinHashLSH(threshold=self.fuzzy_threshold, num_perm=_MINHASH_PERM)
+        self._signatures[model_key] = {}
+        dtype = self._minhash_template.hashvalues.dtype
+        for text_hash, sig in self._conn.execute("SELECT hash, sig FROM signatures WHERE model = ?", (model_key,)):
+            hashvalues = np.frombuffer(sig, dtype=dtype)
+            # 不同版本 datasketch 的签名格式不同，对不上的跳过
+            if len(hashvalues) != _MINHASH_PERM:
+                continue
+            minhash = self._minhash_template.copy()
+            minhash.hashvalues = hashvalues.copy()
+            self._add_signature(model_key, text_hash, minhash)
+        return lsh
+
+    def _add_signature(self, model_key: str, text_hash: bytes, minhash: "MinHash"):
+        signatures = self._signatures[model_key]
+        if text_hash not in signatures:
+            signatures[text_hash] = minhash
+            self._lsh[model_key].insert(text_hash, minhash)
+
+    def _select(self, hashes: List[bytes], model_id: str, dim: int) -> Dict[bytes, np.ndarray]:
+        """按哈希批量查询向量（调用方需持有锁）"""
+        found = {}
+        for start in range(0, len(hashes), _SQLITE_MAX_PARAMS):
+            chunk = hashes[start:start + _SQLITE_MAX_PARAMS]
+            rows = self._conn.execute(
+                f"SELECT hash, vec FROM embeddings WHERE model = ? AND dim = ? "
+                f"AND hash IN ({','.join('?' * len(chunk))})",
+                [model_id, dim, *chunk]
+            ).fetchall()
+            for text_hash, vec in rows:
+                found[text_hash] = np.frombuffer(vec, dtype=np.float32)
+        return found
+
+    def get_many(self, texts: List[str], model_id: str, dim: int, normalize: bool = False) -> Dict[str, np.ndarray]:
+        """
+        批量查询，返回命中的 文本 -> float32 向量
+        model_id 需包含模型名和影响向量的设置，设置变化后旧条目自然失效；
+        normalize=True 时规范化后相同的不同原文共用同一条缓存
+        """
+        model_key = _model_key(model_id, normalize)
+        hashes = {text: self.text_hash(text, normalize) for text in texts}
+        with self._lock:
+            vectors = self._select(list(set(hashes.values())), model_key, dim)
+            found = {text: vectors[h] for text, h in hashes.items() if h in vectors}
+            if not self.fuzzy_threshold:
+                return found
+
+            # 精确匹配未命中的，在同一模型键的条目中找 Jaccard 相似度最高且达到阈值的已有文本
+            nearest = {}  # 文本 -> 最相近文本的哈希
+            for text in set(texts).difference(found):
+                minhash = self._minhash(text, normalize)
+                if minhash is None:
+                    continue
+                lsh = self._ensure_lsh(model_key)
+                signatures = self._signatures[model_key]
+                candidates = [
+                    (minhash.jaccard(signatures[h]), h)
+                    for h in lsh.query(minhash)
+                ]
+                best = max(candidates, default=None)
+                if best is not None and best[0] >= self.fuzzy_threshold:
+                    nearest[text] = best[1]
+            if nearest:
+                vectors = self._select(list(set(nearest.values())), model_key, dim)
+                found.update({text: vectors[h] for text, h in nearest.items() if h in vectors})
+        return found
+
+    def put_many(self, texts: List[str], embeddings: np.ndarray, model_id: str, normalize: bool = False):
+        """批量写入（已存在的条目覆盖），同时记录模糊匹配用的 MinHash 签名；model_id、normalize 需与查询时一致"""
+        model_key = _model_key(model_id, normalize)
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        hashes = [self.text_hash(text, normalize) for text in texts]
+        rows = [
+            (text_hash, model_key, embedding.shape[0], embedding.tobytes())
+            for text_hash, embedding in zip(hashes, embeddings)
+        ]
+        signatures = []
+        if self.fuzzy_threshold:
+            for text, text_hash in zip(texts, hashes):
+                minhash = self._minhash(text, normalize)
+                if minhash is not None:
+                    signatures.append((text_hash, minhash))
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (hash, model, dim, vec) VALUES (?, ?, ?, ?)",
+                rows
+            )
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO signatures (hash, model, sig) VALUES (?, ?, ?)",
+                [(text_hash, model_key, minhash.hashvalues.tobytes()) for text_hash, minhash in signatures]
+            )
+            self._conn.commit()
+            if model_key in self._lsh:
+                for text_hash, minhash in signatures:
+                    self._add_signature(model_key, text_hash, minhash)
+
+    def close(self):
+        """关闭数据库连接"""
+        with self._lock:
+            self._conn.close()
@@ -47,9 +47,9 @@ def example_usage():
         print(f"找到 {len(results)} 个相关结果:")
         for i, result in enumerate(results, 1):
             print(f"\n结果 {i}:")
-            print(f"  相似度: {result['score']:.4f}")
-            print(f"  来源: {result['source']}")
-            print(f"  内容: {result['text']}")
+            print(f"  相似度: {result.score:.4f}")
+            print(f"  来源: {result.source}")
+            print(f"  内容: {result.text}")
         
     except Exception as e:
         print(f"错误: {e}")
@@ -10,6 +10,11 @@ import mcp.types as types
 from mcp.server.models import InitializationOptions
 from mcp.server import NotificationOptions
 
+try:
+    import orjson
+except ImportError:  # orjson 不可用时回退到标准库 json
+    orjson = None
+
 from config import Config
 from simple_rag import SimpleRAGSystem
 
@@ -21,6 +26,66 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# 没有检索结果时的固定回复，直接复用同一个对象
+_EMPTY_TEXT = types.TextContent(type="text", text="没有找到相关信息。")
+
+# 同时在线程池中执行的阻塞 RAG 调用上限（嵌入模型推理与 Milvus 检索），避免并发请求压垮模型
+MAX_BLOCKING_CALLS = 4
+
+def _dumps_json(payload) -> str:
+    """序列化资源内容；优先使用 C 实现的 orjson（UTF-8 原样输出，与 ensure_ascii=False 一致）"""
+    if orjson is not None:
+        return orjson.dumps(payload, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS).decode()
+    return json.dumps(payload, ensure_ascii=False, indent=2)
+
+class BatchedWriter:
+    """合并写入：短时间内并发的添加请求攒成一批，只做一次 add_documents（一次批量编码 + 一次插入）"""
+    
+    def __init__(self, write_batch, max_size: int = 128, max_delay: float = 0.05):
+        self._write_batch = write_batch  # 异步写入函数：接收文档列表，返回是否成功
+        self.max_size = max_size
+        self.max_delay = max_delay
+        self._pending = []  # (文档, future)
+        self._timer = None
+        # 写入期间持有；flush 总会获取一次，从而等到已被定时器或满批取走、仍在写入的批次完成
+        self._write_lock = asyncio.Lock()
+    
+    async def add(self, document: Dict[str, Any]) -> bool:
+        """加入当前批次，等到该批次真正写入后返回结果"""
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((document, future))
+        if len(self._pending) >= self.max_size:
+            await self.flush()
+        elif self._timer is None:
+            self._timer = asyncio.create_task(self._flush_later())
+        return await future
+    
+    async def _flush_later(self):
+        await asyncio.sleep(self.max_delay)
+        self._timer = None
+        await self.flush()
+    
+    async def flush(self):
+        """立即写入当前批次，并等待此前取走的批次全部写完（清空知识库或关闭服务前调用）"""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        # asyncio.Lock 按等待顺序唤醒，各批次按取走的先后依次写入
+        async with self._write_lock:
+            if not batch:
+                return
+            try:
+                success = await self._write_batch([document for document, _ in batch])
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                return
+        for _, future in batch:
+            if not future.done():
+                future.set_result(success)
+
 class MCPRAGServer:
     """MCP RAG 服务器 - 修复日志输出"""
     
@@ -28,6 +93,10 @@ class MCPRAGServer:
         self.config = config
         self.rag_system = SimpleRAGSystem(config)
         self.server = mcp.server.Server("mcp-rag-server")
+        self._blocking_limit = asyncio.Semaphore(MAX_BLOCKING_CALLS)
+        self._writer = BatchedWriter(
+            lambda documents: self._run_blocking(self.rag_system.add_documents, documents)
+        )
         
         # 初始化RAG系统
         self.rag_system.initialize()
@@ -50,6 +119,20 @@ class MCPRAGServer:
         print("   • MCP协议工具", file=sys.stderr)
         print("\n⚡ 服务器已就绪，等待连接...", file=sys.stderr)
     
+    async def _run_blocking(self, func, *args):
+        """在默认线程池中执行阻塞调用，让事件循环可以并发处理其他 MCP 请求"""
+        async with self._blocking_limit:
+            return await asyncio.to_thread(func, *args)
+    
+    def _collect_texts_by_source(self, per_source: int) -> Dict[str, List[str]]:
+        """遍历知识库，每个来源最多保留 per_source 条文本（阻塞调用，在线程池中执行）"""
+        sources = {}
+        for doc in self.rag_system.iter_documents(("text", "source")):
+            texts = sources.setdefault(doc.get('source', '未知'), [])
+            if len(texts) < per_source:
+                texts.append(doc.get('text', ''))
+        return sources
+    
     def _register_tools(self):
         """注册MCP工具"""
         
@@ -124,6 +207,14 @@ class MCPRAGServer:
                         },
                         "required": ["question"]
                     }
+                ),
+                types.Tool(
+                    name="get_rag_stats",
+                    description="查看检索/写入的延迟分位数和查询缓存命中情况",
+                    inputSchema={
+                        "type": "object",
+                        "properties": {}
+                    }
                 )
             ]
         
@@ -139,38 +230,37 @@ class MCPRAGServer:
                     query = arguments.get("query", "")
                     top_k = arguments.get("top_k", 5)
                     
-                    logger.info(f"搜索查询: {query}, top_k: {top_k}")
-                    results = self.rag_system.search(query, top_k)
+                    logger.info("搜索查询: %s, top_k: %s", query, top_k)
+                    # 知识库为空或命中缓存时不进线程池
+                    results = await self.rag_system.asearch(query, top_k, self._run_blocking)
                     
                     if not results:
-                        return [types.TextContent(
-                            type="text",
-                            text="没有找到相关信息。"
-                        )]
+                        return [_EMPTY_TEXT]
                     
-                    output = f"找到 {len(results)} 个相关结果：\n\n"
+                    # score 已是余弦相似度；结果片段收集后一次性 join
+                    parts = [f"找到 {len(results)} 个相关结果：\n\n"]
                     for i, result in enumerate(results, 1):
-                        score = result.get('score', 0)
-                        similarity = max(0, 1 - score)
-                        output += f"{i}. **来源**：{result.get('source', '未知')}\n"
-                        output += f"   **相似度**：{similarity:.2%}\n"
-                        output += f"   **内容**：{result.get('text', '')}\n\n"
+                        parts.append(
+                            f"{i}. **来源**：{result.source}\n"
+                            f"   **相似度**：{max(0, result.score):.2%}\n"
+                            f"   **内容**：{result.text}\n\n"
+                        )
                     
-                    return [types.TextContent(type="text", text=output)]
+                    return [types.TextContent(type="text", text="".join(parts))]
                 
                 elif name == "add_to_knowledge":
                     text = arguments.get("text", "")
                     source = arguments.get("source", "user_input")
                     category = arguments.get("category", "")
                     
-                    logger.info(f"添加文档: 来源={source}")
+                    logger.info("添加文档: 来源=%s", source)
                     document = {
                         "text": text,
                         "source": source,
                         "metadata": {"category": category} if category else {}
                     }
                     
-                    success = self.rag_system.add_documents([document])
+                    success = await self._writer.add(document)
                     
                     if success:
                         return [types.TextContent(
@@ -185,8 +275,10 @@ class MCPRAGServer:
                 
                 elif name == "clear_knowledge":
                     logger.info("清空知识库")
-                    self.rag_system.vector_store.delete_all()
-                    self.rag_system.vector_store.create_collection()
+                    # 先写完排队中的文档，避免它们在清空之后才落库
+                    await self._writer.flush()
+                    await self._run_blocking(self.rag_system.vector_store.delete_all)
+                    await self._run_blocking(self.rag_system.vector_store.create_collection)
                     
                     return [types.TextContent(
                         type="text",
@@ -197,19 +289,22 @@ class MCPRAGServer:
                     question = arguments.get("question", "")
                     include_context = arguments.get("include_context", True)
                     
-                    logger.info(f"RAG查询: {question}")
+                    logger.info("RAG查询: %s", question)
                     
                     if include_context:
-                        answer = self.rag_system.query_with_context(question)
+                        answer = await self._run_blocking(self.rag_system.query_with_context, question)
                     else:
-                        results = self.rag_system.search(question, top_k=3)
+                        results = await self.rag_system.asearch(question, 3, self._run_blocking)
                         if results:
-                            answer = results[0].get('text', '没有相关信息')
+                            answer = results[0].text or '没有相关信息'
                         else:
                             answer = "没有找到相关信息。"
                     
                     return [types.TextContent(type="text", text=answer)]
                 
+                elif name == "get_rag_stats":
+                    return [types.TextContent(type="text", text=_dumps_json(self.rag_system.get_metrics()))]
+                
                 else:
                     return [types.TextContent(
                         type="text",
@@ -263,14 +358,14 @@ class MCPRAGServer:
             if name == "rag_question":
                 question = arguments.get("question", "")
                 
-                results = self.rag_system.search(question, top_k=3)
+                results = await self.rag_system.asearch(question, 3, self._run_blocking)
                 
                 messages = []
                 
                 if results:
-                    context = "相关背景知识：\n\n"
-                    for i, result in enumerate(results, 1):
-                        context += f"{i}. {result.get('text', '')}\n\n"
+                    context = "相关背景知识：\n\n" + "".join(
+                        f"{i}. {result.text}\n\n" for i, result in enumerate(results, 1)
+                    )
                     
                     messages.append(
                         types.PromptMessage(
@@ -298,28 +393,25 @@ class MCPRAGServer:
                 )
             
             elif name == "summarize_knowledge":
-                topic = arguments.get("topic", "")
+                topic = arguments.get("topic", "").strip()
                 
                 if topic:
-                    results = self.rag_system.search(topic, top_k=10)
-                else:
-                    results = self.rag_system.search("", top_k=10)
-                
-                if results:
-                    content = f"关于'{topic}'的知识总结：\n\n" if topic else "知识库内容总结：\n\n"
-                    
+                    results = await self.rag_system.asearch(topic, 10, self._run_blocking)
                     sources = {}
                     for result in results:
-                        source = result.get('source', '未知')
-                        if source not in sources:
-                            sources[source] = []
-                        sources[source].append(result.get('text', ''))
-                    
+                        sources.setdefault(result.source, []).append(result.text)
+                else:
+                    # 没有主题时直接遍历整个知识库，不需要用空字符串做向量检索
+                    sources = await self._run_blocking(self._collect_texts_by_source, 3)
+                
+                if sources:
+                    # 各段收集后一次性 join
+                    parts = [f"关于'{topic}'的知识总结：\n\n" if topic else "知识库内容总结：\n\n"]
                     for source, texts in sources.items():
-                        content += f"## {source}\n"
-                        for text in texts[:3]:
-                            content += f"- {text[:100]}...\n"
-                        content += "\n"
+                        parts.append(f"## {source}\n")
+                        parts.extend(f"- {text[:100]}...\n" for text in texts[:3])
+                        parts.append("\n")
+                    content = "".join(parts)
                     
                     messages = [
                         types.PromptMessage(
@@ -371,22 +463,17 @@ class MCPRAGServer:
         
         @self.server.read_resource()
         async def handle_read_resource(uri: str) -> str:
+            # 新版 MCP 传入的是 AnyUrl 对象，需转成字符串再比较
+            uri = str(uri)
             if uri == "rag://knowledge/stats":
-                stats = self.rag_system.get_stats()
-                return json.dumps(stats, ensure_ascii=False, indent=2)
+                stats = await self._run_blocking(self.rag_system.get_stats)
+                return _dumps_json(stats)
             
             elif uri == "rag://knowledge/sources":
-                results = self.rag_system.search("", top_k=100)
-                
-                source_count = {}
-                for result in results:
-                    source = result.get('source', '未知')
-                    source_count[source] = source_count.get(source, 0) + 1
-                
-                return json.dumps({
-                    "sources": source_count,
-                    "total_documents": len(results)
-                }, ensure_ascii=False, indent=2)
+                counts = await self._run_blocking(self.rag_system.count_by_source)
+                if counts is None:
+                    raise RuntimeError("统计知识来源失败，请检查日志。")
+                return _dumps_json(counts)
             
             else:
                 raise ValueError(f"未知资源：{uri}")
@@ -413,6 +500,8 @@ class MCPRAGServer:
             print("\n🛑 服务器已停止", file=sys.stderr)
         except Exception as e:
             print(f"❌ 服务器错误: {e}", file=sys.stderr)
+        finally:
+            await self._writer.flush()
 
 async def main():
     """主函数"""
@@ -1,36 +1,168 @@
 # milvus_manager.py
 import os
-from typing import List, Dict, Any, Optional
+import threading
+import time
+from dataclasses import dataclass
+from collections import Counter, OrderedDict
+from itertools import islice
+from typing import List, Dict, Any, Iterator, Optional, Sequence
 import numpy as np
+import torch
 from sentence_transformers import SentenceTransformer
-from pymilvus import MilvusClient
+from pymilvus import Collection, MilvusClient, DataType, connections
 import logging
 
+from embedding_cache import EmbeddingCache
+
 logger = logging.getLogger(__name__)
 
+# 向量精度 -> (Milvus 向量字段类型, 写入和查询时使用的 numpy dtype)
+_VECTOR_DTYPES = {
+    "fp32": (DataType.FLOAT_VECTOR, np.float32),
+    "fp16": (DataType.FLOAT16_VECTOR, np.float16),
+}
+
+# 进程内共享的向量模型，按 (模型名, 设备, 是否量化) 缓存，多个管理器实例不重复加载权重
+_MODEL_CACHE: Dict[tuple, SentenceTransformer] = {}
+_MODEL_CACHE_LOCK = threading.Lock()
+
+def _quantize_model(model: SentenceTransformer) -> SentenceTransformer:
+    """CUDA 上转为 FP16；CPU 上把 Linear 层动态量化为 int8"""
+    if model.device.type == "cuda":
+        return model.half()
+    return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+def _get_model(name: str, device: Optional[str] = None, quantize: bool = False) -> SentenceTransformer:
+    """获取（首次使用时加载并预热）共享的 SentenceTransformer 模型"""
+    key = (name, device, quantize)
+    with _MODEL_CACHE_LOCK:
+        model = _MODEL_CACHE.get(key)
+        if model is None:
+            model = SentenceTransformer(name, device=device)
+            if quantize:
+                model = _quantize_model(model)
+            # 预热一次，让首个真实请求不再承担首次推理的初始化开销
+            model.encode(["warmup"], show_progress_bar=False)
+            _MODEL_CACHE[key] = model
+        return model
+
+def _is_uncased(model: SentenceTransformer) -> bool:
+    """模型是否先转小写再分词（如 BERT/MPNet 系的 uncased WordPiece 分词器，同时按空白切分）"""
+    if getattr(getattr(model, "tokenizer", None), "do_lower_case", False):
+        return True
+    try:
+        return bool(getattr(model[0], "do_lower_case", False))
+    except (TypeError, IndexError, KeyError):
+        return False
+
+# 进程内共享的 MilvusClient，按 uri 缓存，重复创建管理器时不再重新打开本地库文件
+_CLIENT_CACHE: Dict[str, MilvusClient] = {}
+_CLIENT_CACHE_LOCK = threading.Lock()
+
+def _get_client(uri: str) -> MilvusClient:
+    """获取共享的 MilvusClient；首次创建时做一次连接测试，通过后才放入缓存"""
+    with _CLIENT_CACHE_LOCK:
+        client = _CLIENT_CACHE.get(uri)
+        if client is None:
+            client = MilvusClient(uri=uri)
+            collections = client.list_collections()
+            logger.info("连接测试成功，现有集合: %s", collections)
+            _CLIENT_CACHE[uri] = client
+        return client
+
+# ORM 连接（query_iterator 只有 ORM 的 Collection 提供），按 uri 建立一次，别名固定
+_ORM_ALIASES: Dict[str, str] = {}
+_ORM_ALIASES_LOCK = threading.Lock()
+
+def _get_orm_alias(uri: str) -> str:
+    """返回 uri 对应的 ORM 连接别名，首次使用时建立连接"""
+    with _ORM_ALIASES_LOCK:
+        alias = _ORM_ALIASES.get(uri)
+        if alias is None:
+            alias = f"mcp_rag_{len(_ORM_ALIASES)}"
+            connections.connect(alias=alias, uri=uri)
+            _ORM_ALIASES[uri] = alias
+        return alias
+
+@dataclass(slots=True, frozen=True)
+class SearchHit:
+    """一条检索结果；score 为余弦相似度。结果会放进查询缓存共享，因此不可变"""
+    id: Any
+    text: str
+    source: str
+    score: float
+
+# 连接 Milvus 服务端时使用 HNSW 近似索引；本地 .db 文件走 Milvus-Lite，只支持 FLAT
+_HNSW_PARAMS = {"M": 16, "efConstruction": 200}
+_HNSW_SEARCH_EF = 64
+
+# 查询缓存淘汰：在最久未使用的若干条中优先淘汰已过期的，其次是命中次数最少的；每写入若干次清理一遍过期条目
+_CACHE_EVICT_SAMPLE = 8
+_CACHE_SWEEP_INTERVAL = 64
+
 class MilvusLiteManager:
     """Milvus-Lite 管理器 - 最终修复版"""
     
     def __init__(self, config):
+        if config.embedding_dtype not in _VECTOR_DTYPES:
+            raise ValueError(f"不支持的向量精度: {config.embedding_dtype}，可选: {list(_VECTOR_DTYPES)}")
         self.config = config
-        self.embedding_model = SentenceTransformer(config.embedding_model)
+        self.embedding_model = _get_model(config.embedding_model, config.embedding_device, config.embedding_quantize)
+        # 只有不区分大小写的模型才能让大小写/空白不同的文本共用向量缓存
+        self._uncased = _is_uncased(self.embedding_model)
         self.client = None
         self.collection_name = config.collection_name
         self.dim = config.embedding_dim
         
         # Milvus-Lite 特定配置
         self.db_path = config.milvus_db_path
+        self._reset_collection_settings()
+        
+        # 语义查询缓存：相同查询直接命中（无需编码），相近查询按余弦相似度命中（跳过 Milvus 检索）
+        # 槽位在淘汰、过期清理或清空时回收到 _free_slots，覆盖同一查询时复用原槽位
+        self._cache_size = max(0, config.search_cache_size)
+        self._cache_threshold = config.search_cache_threshold
+        self._query_cache = OrderedDict()  # query -> (槽位, top_k, 结果)，按 LRU 顺序
+        self._cache_vectors = np.zeros((self._cache_size, self.dim), dtype=np.float32)  # 单位化的查询向量
+        self._cache_top_k = np.zeros(self._cache_size, dtype=np.int64)  # 0 表示槽位空闲
+        self._cache_queries = [None] * self._cache_size
+        self._cache_hit_counts = np.zeros(self._cache_size, dtype=np.int64)  # 各槽位被命中的次数
+        self._free_slots = list(range(self._cache_size))
+        self._puts_since_sweep = 0
+        # 缓存结果的有效期（秒，0 表示不过期）；连接 Milvus 服务端时其他进程的写入不会触发本地清空，靠过期兜底
+        self._cache_ttl = max(0.0, config.search_cache_ttl)
+        self._cache_expires = np.zeros(self._cache_size, dtype=np.float64)  # 各槽位的过期时刻（time.monotonic）
+        self._cache_stats = Counter()  # hits / semantic_hits / misses / evictions / expirations
+        # MCP 服务器在线程池中并发调用 search / add_documents，缓存读写需加锁
+        self._cache_lock = threading.Lock()
+        self._cache_generation = 0
+        # 查询向量只取决于查询文本，与集合内容无关，写入数据时不需要清空
+        self._embedding_cache = OrderedDict()  # query -> 查询向量，按 LRU 顺序
+        # 文档向量的持久化缓存，打开失败时不影响正常编码
+        self._embedding_store = None
+        if config.embedding_cache_path:
+            try:
+                self._embedding_store = EmbeddingCache(config.embedding_cache_path, config.embedding_cache_fuzzy_threshold)
+            except Exception as e:
+                logger.warning(f"打开向量缓存失败，将直接编码: {e}")
+        # 集合行数，随写入/清空维护；None 表示未知。为 0 时检索直接返回空，不做编码和 Milvus 调用
+        # 只对本地 .db 文件生效：Milvus-Lite 的库文件由本进程独占；连接服务端时其他客户端的写入本进程看不到
+        self._row_count = None
+        self._owns_data = self.db_path.endswith(".db")
+    
+    def _reset_collection_settings(self):
+        """按配置设置新建集合使用的向量类型与索引（打开已有集合时会改为沿用集合自身的设置）"""
+        self.vector_type, self.vector_np_dtype = _VECTOR_DTYPES[self.config.embedding_dtype]
+        # 向量在编码时单位化，COSINE 的 distance 即为相似度
+        self.metric_type = "COSINE"
+        self.index_type = "FLAT" if self.db_path.endswith(".db") else "HNSW"
     
     def connect(self):
         """连接到 Milvus-Lite"""
         try:
-            # 对于 Milvus-Lite，我们使用本地文件存储
-            self.client = MilvusClient(uri=self.db_path)
+            # 对于 Milvus-Lite，我们使用本地文件存储；同一 uri 复用已打开的客户端
+            self.client = _get_client(self.db_path)
             logger.info(f"连接到 Milvus-Lite 数据库: {self.db_path}")
-            
-            # 测试连接
-            collections = self.client.list_collections()
-            logger.info(f"连接测试成功，现有集合: {collections}")
             return True
             
         except Exception as e:
@@ -50,19 +182,37 @@ class MilvusLiteManager:
                     info = self.client.describe_collection(self.collection_name)
                     logger.info(f"集合信息: {info}")
                     
-                    # 检查维度是否匹配
-                    if hasattr(info, 'schema') and info.schema:
-                        for field in info.schema.fields:
-                            if field.name == "vector" and hasattr(field, 'params'):
-                                dim = field.params.get('dim')
-                                if dim and dim != self.dim:
-                                    logger.warning(f"集合维度不匹配: 期望 {self.dim}, 实际 {dim}")
-                                    # 删除并重新创建
-                                    self.client.drop_collection(self.collection_name)
-                                    return self._create_new_collection()
+                    # 检查维度是否匹配（MilvusClient.describe_collection 返回字典）
+                    for field in info.get("fields", []):
+                        if field.get("name") != "vector":
+                            continue
+                        dim = field.get("params", {}).get("dim")
+                        if dim and int(dim) != self.dim:
+                            logger.warning(f"集合维度不匹配: 期望 {self.dim}, 实际 {dim}")
+                            # 删除并重新创建
+                            self.client.drop_collection(self.collection_name)
+                            return self._create_new_collection()
+                        # 精度不一致时沿用已有集合的向量类型，避免为此删除已有数据
+                        for vector_type, np_dtype in _VECTOR_DTYPES.values():
+                            if field.get("type") == vector_type and vector_type != self.vector_type:
+                                logger.warning(f"集合向量类型为 {vector_type.name}，与配置的 {self.config.embedding_dtype} 不一致，沿用集合类型")
+                                self.vector_type, self.vector_np_dtype = vector_type, np_dtype
+                    
+                    # 同样沿用已有索引的类型和度量；旧的 L2 集合存的是未单位化的向量，编码时也不做单位化
+                    index = self.client.describe_index(self.collection_name, "vector")
+                    if index.get("metric_type") and index["metric_type"] != self.metric_type:
+                        logger.warning(f"集合索引度量为 {index['metric_type']}，与默认的 {self.metric_type} 不一致，沿用集合度量（delete_all 后按 {self.metric_type} 重建）")
+                        self.metric_type = index["metric_type"]
+                    self.index_type = index.get("index_type", self.index_type)
                 except Exception as e:
                     logger.warning(f"获取集合信息失败: {e}")
                 
+                try:
+                    self._row_count = int(self.client.get_collection_stats(self.collection_name).get("row_count", 0))
+                except Exception as e:
+                    logger.warning(f"获取集合行数失败: {e}")
+                    self._row_count = None
+                
                 return True
             
             # 创建新集合
@@ -75,36 +225,93 @@ class MilvusLiteManager:
     def _create_new_collection(self):
         """创建新集合"""
         try:
-            # 使用 MilvusClient 的简化方式创建集合
+            # 显式定义 schema 才能指定向量字段类型；主键自动生成，其余字段走动态字段
+            schema = self.client.create_schema(auto_id=True, enable_dynamic_field=True)
+            schema.add_field("id", DataType.INT64, is_primary=True)
+            schema.add_field("vector", self.vector_type, dim=self.dim)
+            
+            index_params = self.client.prepare_index_params()
+            index_params.add_index(
+                "vector",
+                index_type=self.index_type,
+                metric_type=self.metric_type,
+                params=_HNSW_PARAMS if self.index_type == "HNSW" else {}
+            )
+            
             self.client.create_collection(
                 collection_name=self.collection_name,
-                dimension=self.dim,
-                metric_type="L2"
+                schema=schema,
+                index_params=index_params
             )
             
-            logger.info(f"集合 '{self.collection_name}' 创建成功 (维度: {self.dim})")
+            self._row_count = 0
+            logger.info(f"集合 '{self.collection_name}' 创建成功 (维度: {self.dim}, 类型: {self.vector_type.name}, 索引: {self.index_type}/{self.metric_type})")
             return True
             
         except Exception as e:
             logger.error(f"创建新集合失败: {e}")
             return False
     
-    def get_embedding(self, text: str) -> List[float]:
-        """获取文本向量"""
+    def get_embedding(self, text: str) -> np.ndarray:
+        """获取文本向量；直接返回连续的 numpy 数组（传入列表时为矩阵），不再转成 Python 列表"""
         if isinstance(text, list):
-            embeddings = self.embedding_model.encode(text, convert_to_numpy=True)
-            return [emb.tolist() for emb in embeddings]
-        else:
-            embedding = self.embedding_model.encode([text], convert_to_numpy=True)[0]
-            return embedding.tolist()
+            return self.get_embeddings(text)
+        return self.get_embeddings([text])[0]
+    
+    def get_embeddings(self, texts: List[str]) -> np.ndarray:
+        """批量获取文本向量，返回 (len(texts), dim) 的矩阵，精度与集合向量字段一致"""
+        if not texts:
+            return np.empty((0, self.dim), dtype=self.vector_np_dtype)
+        # 重复文本只编码一次，再按原顺序散回各行
+        positions = {}
+        inverse = [positions.setdefault(text, len(positions)) for text in texts]
+        unique_texts = list(positions)
+        # 一次前向批量编码，避免逐条调用 encode 的开销
+        embeddings = self.embedding_model.encode(
+            unique_texts,
+            batch_size=64,
+            convert_to_numpy=True,
+            normalize_embeddings=self.metric_type != "L2",
+            show_progress_bar=False
+        ).astype(self.vector_np_dtype, copy=False)
+        if len(unique_texts) < len(texts):
+            logger.debug("批量编码去重: %d -> %d", len(texts), len(unique_texts))
+            embeddings = embeddings[inverse]
+        return embeddings
+    
+    def get_document_embeddings(self, texts: List[str]) -> np.ndarray:
+        """文档向量：先查持久化向量缓存，只编码未命中的文本并写回缓存"""
+        if self._embedding_store is None or not texts:
+            return self.get_embeddings(texts)
+        # 向量取决于模型、是否量化和是否单位化，这些都计入缓存键
+        model_id = "|".join((
+            self.config.embedding_model,
+            "int8" if self.config.embedding_quantize else "full",
+            "raw" if self.metric_type == "L2" else "unit"
+        ))
+        try:
+            found = self._embedding_store.get_many(texts, model_id, self.dim, self._uncased)
+        except Exception as e:
+            logger.warning(f"读取向量缓存失败，将直接编码: {e}")
+            return self.get_embeddings(texts)
+        missing = list(dict.fromkeys(text for text in texts if text not in found))
+        if missing:
+            encoded = self.get_embeddings(missing)
+            try:
+                self._embedding_store.put_many(missing, encoded, model_id, self._uncased)
+            except Exception as e:
+                logger.warning(f"写入向量缓存失败: {e}")
+            found.update(zip(missing, encoded))
+        logger.debug("文档向量缓存命中 %d/%d", len(texts) - len(missing), len(texts))
+        return np.stack([found[text] for text in texts]).astype(self.vector_np_dtype, copy=False)
     
     def add_documents(self, documents: List[Dict[str, Any]]):
         """添加文档 - 修复字段名问题"""
         try:
             data = []
-            for doc in documents:
+            embeddings = self.get_document_embeddings([doc["text"] for doc in documents])
+            for doc, embedding in zip(documents, embeddings):
                 text = doc["text"]
-                embedding = self.get_embedding(text)
                 
                 # 准备插入数据 - 使用正确的字段名
                 # MilvusClient 需要 'vector' 字段，但可能还需要其他字段
@@ -129,7 +336,9 @@ class MilvusLiteManager:
                 data=data
             )
             
-            logger.info(f"插入了 {len(documents)} 个文档, ID 数量: {len(result.get('ids', []))}")
+            logger.info("插入了 %d 个文档, ID 数量: %d", len(documents), len(result.get('ids', [])))
+            self._count_inserted(result, len(data))
+            self.clear_search_cache()
             return True
             
         except Exception as e:
@@ -145,69 +354,330 @@ class MilvusLiteManager:
         """替代的添加文档方法"""
         try:
             # 更简单的方法：只插入必要的字段
-            data = []
-            for doc in documents:
-                text = doc["text"]
-                embedding = self.get_embedding(text)
-                
-                # 只使用vector字段
-                data.append({
-                    "vector": embedding
-                })
+            embeddings = self.get_document_embeddings([doc["text"] for doc in documents])
+            # 只使用vector字段
+            data = [{"vector": embedding} for embedding in embeddings]
             
             result = self.client.insert(
                 collection_name=self.collection_name,
                 data=data
             )
             
-            logger.info(f"使用替代方法插入了 {len(documents)} 个文档")
+            logger.info("使用替代方法插入了 %d 个文档", len(documents))
+            self._count_inserted(result, len(data))
+            self.clear_search_cache()
             return True
             
         except Exception as e:
             logger.error(f"替代方法失败: {e}")
             raise
     
-    def search(self, query: str, top_k: int = 5) -> List[Dict[str, Any]]:
-        """搜索相似文档"""
+    def _count_inserted(self, result, default: int):
+        """插入成功后更新缓存的集合行数"""
+        with self._cache_lock:
+            if self._row_count is not None:
+                self._row_count += result.get("insert_count", default)
+    
+    def is_empty(self) -> bool:
+        """集合是否确定为空（行数未知，或连接的是可能被其他客户端写入的服务端时返回 False）"""
+        return self._owns_data and self._row_count == 0
+    
+    def get_query_embedding(self, query: str) -> np.ndarray:
+        """获取查询向量，按查询文本缓存（容量同查询缓存）"""
+        return self.get_query_embeddings([query])[0]
+    
+    def get_query_embeddings(self, queries: List[str]) -> np.ndarray:
+        """批量获取查询向量：命中向量缓存的直接取用，其余一次批量编码后写入缓存"""
+        embeddings = np.empty((len(queries), self.dim), dtype=self.vector_np_dtype)
+        missing = []
+        with self._cache_lock:
+            for i, query in enumerate(queries):
+                embedding = self._embedding_cache.get(query)
+                if embedding is None:
+                    missing.append(i)
+                else:
+                    self._embedding_cache.move_to_end(query)
+                    embeddings[i] = embedding
+        if missing:
+            encoded = self.get_embeddings([queries[i] for i in missing])
+            embeddings[missing] = encoded
+            if self._cache_size:
+                with self._cache_lock:
+                    for i, embedding in zip(missing, encoded):
+                        self._embedding_cache[queries[i]] = embedding
+                        if len(self._embedding_cache) > self._cache_size:
+                            self._embedding_cache.popitem(last=False)
+        return embeddings
+    
+    def close(self):
+        """释放本实例持有的资源（向量缓存的数据库连接、查询缓存）；共享的 MilvusClient 和模型不关闭"""
+        if self._embedding_store is not None:
+            self._embedding_store.close()
+            self._embedding_store = None
+        self.clear_search_cache()
+        with self._cache_lock:
+            self._embedding_cache.clear()
+    
+    def clear_search_cache(self):
+        """清空查询缓存（集合内容变化后缓存的结果不再有效）"""
+        with self._cache_lock:
+            self._cache_generation += 1
+            self._query_cache.clear()
+            self._cache_top_k[:] = 0
+            self._cache_queries = [None] * self._cache_size
+            self._free_slots = list(range(self._cache_size))
+    
+    def _cache_get(self, query: str, top_k: int) -> Optional[List[SearchHit]]:
+        """完全相同的查询：缓存的结果数不少于 top_k 时命中"""
+        with self._cache_lock:
+            entry = self._query_cache.get(query)
+            if entry is None or entry[1] < top_k or self._cache_expires[entry[0]] < time.monotonic():
+                return None
+            self._query_cache.move_to_end(query)
+            self._cache_hit_counts[entry[0]] += 1
+            self._cache_stats["hits"] += 1
+            return entry[2][:top_k]
+    
+    def _cache_get_similar(self, unit_vector: np.ndarray, top_k: int) -> Optional[List[SearchHit]]:
+        """相近的查询：与缓存查询向量的最大余弦相似度不低于阈值时命中"""
+        with self._cache_lock:
+            if not self._query_cache:
+                self._cache_stats["misses"] += 1
+                return None
+            sims = self._cache_vectors @ unit_vector
+            # 空闲槽位 top_k 为 0，同样被排除；已过期的槽位也不参与
+            sims[(self._cache_top_k < top_k) | (self._cache_expires < time.monotonic())] = -np.inf
+            slot = int(np.argmax(sims))
+            if sims[slot] < self._cache_threshold:
+                self._cache_stats["misses"] += 1
+                return None
+            query = self._cache_queries[slot]
+            self._query_cache.move_to_end(query)
+            self._cache_hit_counts[slot] += 1
+            self._cache_stats["semantic_hits"] += 1
+            return self._query_cache[query][2][:top_k]
+    
+    def _cache_remove(self, query: str) -> int:
+        """移除一条缓存并返回它的槽位（调用方需持有锁）"""
+        slot = self._query_cache.pop(query)[0]
+        self._cache_top_k[slot] = 0
+        self._cache_queries[slot] = None
+        return slot
+    
+    def _cache_sweep(self, now: float):
+        """清理全部已过期的条目，槽位回收到空闲列表（调用方需持有锁）"""
+        for slot in np.flatnonzero((self._cache_top_k > 0) & (self._cache_expires < now)):
+            self._free_slots.append(self._cache_remove(self._cache_queries[slot]))
+            self._cache_stats["expirations"] += 1
+    
+    def _cache_victim(self, now: float) -> str:
+        """在最久未使用的几条中选出要淘汰的：已过期的优先，其次命中次数最少，再次最久未使用（调用方需持有锁）"""
+        candidates = islice(self._query_cache.items(), _CACHE_EVICT_SAMPLE)
+        query, _ = min(
+            candidates,
+            key=lambda item: (self._cache_expires[item[1][0]] >= now, self._cache_hit_counts[item[1][0]])
+        )
+        return query
+    
+    def _cache_put(self, query: str, unit_vector: np.ndarray, top_k: int, results: List[SearchHit], generation: int):
+        """写入缓存，满了按 _cache_victim 淘汰；检索期间缓存被清空过（generation 变化）则丢弃"""
+        with self._cache_lock:
+            if self._cache_size == 0 or generation != self._cache_generation:
+                return
+            now = time.monotonic()
+            self._puts_since_sweep += 1
+            if self._cache_ttl and self._puts_since_sweep >= _CACHE_SWEEP_INTERVAL:
+                self._puts_since_sweep = 0
+                self._cache_sweep(now)
+            
+            hit_count = 0
+            if query in self._query_cache:
+                # 同一查询以更大的 top_k 重新写入，沿用原槽位和命中次数
+                slot = self._cache_remove(query)
+                hit_count = self._cache_hit_counts[slot]
+            elif self._free_slots:
+                slot = self._free_slots.pop()
+            else:
+                slot = self._cache_remove(self._cache_victim(now))
+                self._cache_stats["evictions"] += 1
+            self._query_cache[query] = (slot, top_k, results)
+            self._cache_vectors[slot] = unit_vector
+            self._cache_top_k[slot] = top_k
+            self._cache_queries[slot] = query
+            self._cache_hit_counts[slot] = hit_count
+            self._cache_expires[slot] = now + self._cache_ttl if self._cache_ttl else np.inf
+    
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """查询缓存统计：完全命中、语义命中、未命中次数与命中率"""
+        with self._cache_lock:
+            hits = self._cache_stats["hits"]
+            semantic_hits = self._cache_stats["semantic_hits"]
+            misses = self._cache_stats["misses"]
+            evictions = self._cache_stats["evictions"]
+            expirations = self._cache_stats["expirations"]
+            size = len(self._query_cache)
+        total = hits + semantic_hits + misses
+        return {
+            "size": size,
+            "hits": hits,
+            "semantic_hits": semantic_hits,
+            "misses": misses,
+            "evictions": evictions,
+            "expirations": expirations,
+            "hit_rate": (hits + semantic_hits) / total if total else 0.0
+        }
+    
+    def search(self, query: Optional[str], top_k: int = 5,
+               query_embedding: Optional[np.ndarray] = None) -> List[SearchHit]:
+        """搜索相似文档；调用方已有查询向量时可通过 query_embedding 传入，跳过编码"""
         try:
+            if self.is_empty():
+                return []
+            generation = self._cache_generation
+            if query is not None:
+                cached = self._cache_get(query, top_k)
+                if cached is not None:
+                    return list(cached)
+            
             # 生成查询向量
-            query_embedding = self.get_embedding(query)
+            if query_embedding is None:
+                if query is None:
+                    raise ValueError("query 和 query_embedding 不能同时为空")
+                if not query.strip():
+                    # 空查询的向量检索只会返回任意近邻，直接按存储顺序取前 top_k 条，省去编码和检索
+                    return self._first_documents(top_k)
+                query_embedding = self.get_query_embedding(query)
+            else:
+                query_embedding = np.asarray(query_embedding, dtype=self.vector_np_dtype)
+            unit_vector = query_embedding.astype(np.float32)
+            norm = np.linalg.norm(unit_vector)
+            if norm > 0:
+                unit_vector /= norm
+            cached = self._cache_get_similar(unit_vector, top_k)
+            if cached is not None:
+                return list(cached)
             
             # 执行搜索
-            results = self.client.search(
-                collection_name=self.collection_name,
-                data=[query_embedding],
-                limit=top_k,
-                search_params={"metric_type": "L2", "params": {}},
-                output_fields=["text", "source"]  # 指定要返回的字段
-            )
+            formatted_results = self._search_vectors([query_embedding], top_k)[0]
             
-            # 格式化结果
-            formatted_results = []
-            if results and len(results) > 0:
-                for result in results[0]:  # results[0] 是因为我们只搜索了一个向量
-                    formatted_results.append({
-                        "id": result.get("id"),
-                        "text": result.get("entity", {}).get("text", ""),
-                        "source": result.get("entity", {}).get("source", "unknown"),
-                        "score": result.get("distance", 0)
-                    })
-            
-            logger.info(f"搜索到 {len(formatted_results)} 个结果")
-            return formatted_results
+            # 每次检索都会执行，降为 debug 级别
+            logger.debug("搜索到 %d 个结果", len(formatted_results))
+            if query is not None:
+                self._cache_put(query, unit_vector, top_k, formatted_results, generation)
+            return list(formatted_results)
             
         except Exception as e:
             logger.error(f"搜索失败: {e}")
             return []
     
+    def cached_search(self, query: str, top_k: int = 5) -> Optional[List[SearchHit]]:
+        """不编码、不访问 Milvus 就能给出的结果（集合为空，或完全相同的查询命中缓存）；否则返回 None"""
+        if self.is_empty():
+            return []
+        cached = self._cache_get(query, top_k)
+        return list(cached) if cached is not None else None
+    
+    def batch_search(self, queries: List[str], top_k: int = 5) -> List[List[SearchHit]]:
+        """批量搜索：先查缓存，其余查询一次批量编码、一次多向量 Milvus 检索；结果与 queries 一一对应"""
+        try:
+            if self.is_empty():
+                return [[] for _ in queries]
+            generation = self._cache_generation
+            results: List[Optional[List[SearchHit]]] = [None] * len(queries)
+            pending = {}  # 查询 -> 它在 queries 中的下标（重复的查询只检索一次）
+            for i, query in enumerate(queries):
+                if not query.strip():
+                    results[i] = self._first_documents(top_k)
+                    continue
+                cached = self._cache_get(query, top_k)
+                if cached is not None:
+                    results[i] = list(cached)
+                else:
+                    pending.setdefault(query, []).append(i)
+            if not pending:
+                return results
+            
+            embeddings = self.get_query_embeddings(list(pending))
+            unit_vectors = embeddings.astype(np.float32)
+            norms = np.linalg.norm(unit_vectors, axis=1, keepdims=True)
+            np.divide(unit_vectors, norms, out=unit_vectors, where=norms > 0)
+            
+            to_search = []  # (查询, 下标, 查询向量, 单位向量)
+            for (query, indices), embedding, unit_vector in zip(pending.items(), embeddings, unit_vectors):
+                cached = self._cache_get_similar(unit_vector, top_k)
+                if cached is None:
+                    to_search.append((query, indices, embedding, unit_vector))
+                    continue
+                for i in indices:
+                    results[i] = list(cached)
+            
+            if to_search:
+                hits_per_query = self._search_vectors([item[2] for item in to_search], top_k)
+                for (query, indices, _, unit_vector), hits in zip(to_search, hits_per_query):
+                    self._cache_put(query, unit_vector, top_k, hits, generation)
+                    for i in indices:
+                        results[i] = list(hits)
+            logger.debug("批量搜索 %d 个查询, 实际检索 %d 个", len(queries), len(to_search))
+            return results
+            
+        except Exception as e:
+            logger.error(f"批量搜索失败: {e}")
+            return [[] for _ in queries]
+    
+    def _search_vectors(self, vectors: Sequence[np.ndarray], top_k: int) -> List[List[SearchHit]]:
+        """一次 Milvus 调用检索多个查询向量，按输入顺序返回各自的结果"""
+        results = self.client.search(
+            collection_name=self.collection_name,
+            data=list(vectors),
+            limit=top_k,
+            search_params={
+                "metric_type": self.metric_type,
+                "params": {"ef": max(_HNSW_SEARCH_EF, top_k)} if self.index_type == "HNSW" else {}
+            },
+            output_fields=["text", "source"]  # 指定要返回的字段
+        )
+        
+        # 格式化结果
+        hits_per_query = []
+        for hits in results or []:
+            formatted_results = []
+            for result in hits:
+                distance = result.get("distance", 0)
+                entity = result.get("entity", {})
+                formatted_results.append(SearchHit(
+                    id=result.get("id"),
+                    text=entity.get("text", ""),
+                    source=entity.get("source", "unknown"),
+                    # score 统一为余弦相似度；单位向量的 L2 距离（平方）为 2 - 2cos
+                    score=1 - distance / 2 if self.metric_type == "L2" else distance
+                ))
+            hits_per_query.append(formatted_results)
+        return hits_per_query
+    
+    def _first_documents(self, limit: int) -> List[SearchHit]:
+        """按存储顺序取前 limit 条文档，格式与 search 结果一致（无相似度，score 记为 0）"""
+        documents = self.iter_documents(batch_size=max(1, min(limit, 500)))
+        return [
+            SearchHit(
+                id=doc.get("id"),
+                text=doc.get("text", ""),
+                source=doc.get("source", "unknown"),
+                score=0.0
+            )
+            for doc in islice(documents, limit)
+        ]
+    
     def delete_all(self):
         """删除所有文档"""
         try:
             # 删除集合
+            self.clear_search_cache()
+            self._row_count = None
             self.client.drop_collection(self.collection_name)
             logger.info(f"集合 '{self.collection_name}' 已删除")
             
-            # 重新创建集合
+            # 按配置重新创建集合
+            self._reset_collection_settings()
             self._create_new_collection()
             return True
             
@@ -215,6 +685,33 @@ class MilvusLiteManager:
             logger.error(f"删除集合失败: {e}")
             return False
     
+    def iter_documents(self, fields: Sequence[str] = ("text", "source"),
+                       batch_size: int = 500) -> Iterator[Dict[str, Any]]:
+        """分批遍历集合中的全部文档（只取标量字段），不做向量编码和检索"""
+        # pymilvus 2.4 的 MilvusClient 没有 query_iterator，通过单独的 ORM 连接使用迭代器
+        collection = Collection(self.collection_name, using=_get_orm_alias(self.db_path))
+        iterator = collection.query_iterator(batch_size=batch_size, output_fields=list(fields))
+        try:
+            while rows := iterator.next():
+                yield from rows
+        finally:
+            iterator.close()
+    
+    def count_by_source(self) -> Optional[Dict[str, Any]]:
+        """按来源统计文档数"""
+        try:
+            source_count = Counter(
+                doc.get("source", "unknown")
+                for doc in self.iter_documents(fields=("source",), batch_size=1000)
+            )
+            return {
+                "sources": dict(source_count),
+                "total_documents": sum(source_count.values())
+            }
+        except Exception as e:
+            logger.error(f"统计来源失败: {e}")
+            return None
+    
     def get_collection_info(self):
         """获取集合信息"""
         try:
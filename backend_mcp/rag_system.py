@@ -3,7 +3,7 @@ import asyncio
 import logging
 from typing import List, Dict, Any
 from config_fixed_final import Config
-from milvus_manager_fixed_final import MilvusLiteManager
+from milvus_manager_fixed_final import MilvusLiteManager, SearchHit
 
 # 配置日志
 logging.basicConfig(
@@ -59,7 +59,7 @@ class SimpleRAGSystem:
             logger.error(f"添加文档失败: {e}")
             return False
     
-    def search(self, query: str, top_k: int = 5) -> List[Dict[str, Any]]:
+    def search(self, query: str, top_k: int = 5) -> List[SearchHit]:
         """搜索文档"""
         if not self.initialized:
             self.initialize()
@@ -73,29 +73,17 @@ class SimpleRAGSystem:
         if not results:
             return "抱歉，我没有找到相关的信息。"
         
-        # 构建上下文
-        context = "以下是从知识库中找到的相关信息：\n\n"
-        for i, result in enumerate(results, 1):
-            score = result.get('score', 0)
-            # 转换距离为相似度 (L2距离越小越相似)
-            similarity = max(0, 1 - score)
-            context += f"{i}. 【来源：{result.get('source', 'unknown')}，相似度：{similarity:.2%}】\n"
-            context += f"   {result.get('text', '')}\n\n"
-        
-        # 构建回答
-        answer = f"问题：{query}\n\n"
-        answer += "回答：\n"
-        answer += results[0].get('text', '') + "\n\n"
-        
+        # 单次遍历结果，拼接片段后一次性 join
+        parts = [f"问题：{query}\n\n", "回答：\n", results[0].text, "\n\n"]
         if len(results) > 1:
-            answer += "其他相关信息：\n"
+            parts.append("其他相关信息：\n")
             for i, result in enumerate(results[1:], 2):
-                text = result.get('text', '')
+                text = result.text
                 if len(text) > 100:
                     text = text[:100] + "..."
-                answer += f"{i}. {text}\n"
+                parts.append(f"{i}. {text}\n")
         
-        return answer
+        return "".join(parts)
     
     def get_stats(self):
         """获取系统统计信息"""
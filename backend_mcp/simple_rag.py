@@ -1,9 +1,18 @@
 # simple_rag_fixed.py
 import asyncio
+import atexit
+import dataclasses
 import logging
-from typing import List, Dict, Any
+import threading
+import time
+from collections import Counter, defaultdict, deque
+from typing import List, Dict, Any, Optional
+import numpy as np
 from config import Config
-from milvus_manager import MilvusLiteManager
+from milvus_manager import MilvusLiteManager, SearchHit
+
+# 每种操作保留最近多少次调用的耗时，用于计算延迟分位数
+METRICS_WINDOW = 1024
 
 # 配置日志
 logging.basicConfig(
@@ -12,13 +21,53 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# 进程内共享的向量存储管理器，按完整配置缓存：重复创建 RAG 系统（如 MCP 服务器热重载）时
+# 不再重新打开向量缓存、重建查询缓存，同一集合的多个实例也共用行数和查询缓存，不会互相读到过期结果
+_VECTOR_STORES: Dict[tuple, MilvusLiteManager] = {}
+_VECTOR_STORES_LOCK = threading.Lock()
+
+def _get_vector_store(config: Config) -> MilvusLiteManager:
+    """获取（首次使用时创建）与配置对应的共享管理器"""
+    key = dataclasses.astuple(config)
+    with _VECTOR_STORES_LOCK:
+        store = _VECTOR_STORES.get(key)
+        if store is None:
+            # 管理器持有配置的副本：调用方之后修改自己的 Config 不会让管理器与缓存键不一致
+            store = MilvusLiteManager(dataclasses.replace(config))
+            _VECTOR_STORES[key] = store
+        return store
+
+def close_vector_stores():
+    """关闭并移除所有共享的管理器（进程退出时自动调用）；之后新建的 RAG 系统会重新创建"""
+    with _VECTOR_STORES_LOCK:
+        stores = list(_VECTOR_STORES.values())
+        _VECTOR_STORES.clear()
+    for store in stores:
+        try:
+            store.close()
+        except Exception as e:
+            logger.warning(f"关闭向量存储时出错: {e}")
+
+atexit.register(close_vector_stores)
+
 class SimpleRAGSystem:
     """简化的 RAG 系统 """
     
     def __init__(self, config=None):
         self.config = config or Config()
-        self.vector_store = MilvusLiteManager(self.config)
+        self.vector_store = _get_vector_store(self.config)
         self.initialized = False
+        # 调用耗时统计：操作名 -> 最近 METRICS_WINDOW 次的耗时（纳秒），以及累计调用次数
+        self._latencies = defaultdict(lambda: deque(maxlen=METRICS_WINDOW))
+        self._call_counts = Counter()
+        self._metrics_lock = threading.Lock()
+    
+    def _record(self, operation: str, start_ns: int):
+        """记录一次调用耗时"""
+        elapsed = time.perf_counter_ns() - start_ns
+        with self._metrics_lock:
+            self._latencies[operation].append(elapsed)
+            self._call_counts[operation] += 1
     
     def initialize(self):
         """初始化系统"""
@@ -48,20 +97,65 @@ class SimpleRAGSystem:
         if not self.initialized:
             self.initialize()
         
+        # 大批量导入时分批写入，限制单次编码的显存/内存占用和单个插入请求的大小
+        batch_size = max(1, self.config.insert_batch_size)
+        added = 0
+        started = time.perf_counter_ns()
         try:
-            self.vector_store.add_documents(documents)
-            logger.info(f"成功添加 {len(documents)} 个文档")
+            for start in range(0, len(documents), batch_size):
+                batch = documents[start:start + batch_size]
+                self.vector_store.add_documents(batch)
+                added += len(batch)
+            logger.info("成功添加 %d 个文档", added)
             return True
         except Exception as e:
-            logger.error(f"添加文档失败: {e}")
+            logger.error("添加文档失败（已写入 %d/%d 个）: %s", added, len(documents), e)
             return False
+        finally:
+            self._record("add_documents", started)
+    
+    def search(self, query: Optional[str] = None, top_k: int = 5, query_embedding=None) -> List[SearchHit]:
+        """搜索文档；已有查询向量时可直接传入 query_embedding"""
+        if not self.initialized:
+            self.initialize()
+        
+        start = time.perf_counter_ns()
+        try:
+            return self.vector_store.search(query, top_k, query_embedding)
+        finally:
+            self._record("search", start)
     
-    def search(self, query: str, top_k: int = 5) -> List[Dict[str, Any]]:
-        """搜索文档"""
+    def batch_search(self, queries: List[str], top_k: int = 5) -> List[List[SearchHit]]:
+        """批量搜索，一次编码、一次 Milvus 检索；结果与 queries 一一对应"""
         if not self.initialized:
             self.initialize()
         
-        return self.vector_store.search(query, top_k)
+        start = time.perf_counter_ns()
+        try:
+            return self.vector_store.batch_search(queries, top_k)
+        finally:
+            self._record("batch_search", start)
+    
+    async def asearch(self, query: str, top_k: int = 5, run_blocking=asyncio.to_thread) -> List[SearchHit]:
+        """异步搜索：命中缓存时直接在事件循环上返回，否则交给 run_blocking（默认线程池）执行检索"""
+        if self.initialized:
+            start = time.perf_counter_ns()
+            cached = self.vector_store.cached_search(query, top_k)
+            if cached is not None:
+                self._record("search", start)
+                return cached
+        return await run_blocking(self.search, query, top_k)
+    
+    async def abatch_search(self, queries: List[str], top_k: int = 5,
+                            run_blocking=asyncio.to_thread) -> List[List[SearchHit]]:
+        """异步批量搜索：全部命中缓存时直接返回，否则整批交给 run_blocking 做一次批量检索"""
+        if self.initialized:
+            start = time.perf_counter_ns()
+            cached = [self.vector_store.cached_search(query, top_k) for query in queries]
+            if all(results is not None for results in cached):
+                self._record("batch_search", start)
+                return cached
+        return await run_blocking(self.batch_search, queries, top_k)
     
     def query_with_context(self, query: str) -> str:
         """带上下文的查询"""
@@ -70,29 +164,43 @@ class SimpleRAGSystem:
         if not results:
             return "抱歉，我没有找到相关的信息。"
         
-        # 构建上下文
-        context = "以下是从知识库中找到的相关信息：\n\n"
-        for i, result in enumerate(results, 1):
-            score = result.get('score', 0)
-            # 转换距离为相似度 (L2距离越小越相似)
-            similarity = max(0, 1 - score)
-            context += f"{i}. 【来源：{result.get('source', 'unknown')}，相似度：{similarity:.2%}】\n"
-            context += f"   {result.get('text', '')}\n\n"
-        
-        # 构建回答
-        answer = f"问题：{query}\n\n"
-        answer += "回答：\n"
-        answer += results[0].get('text', '') + "\n\n"
-        
+        # 单次遍历结果，拼接片段后一次性 join
+        parts = [f"问题：{query}\n\n", "回答：\n", results[0].text, "\n\n"]
         if len(results) > 1:
-            answer += "其他相关信息：\n"
+            parts.append("其他相关信息：\n")
             for i, result in enumerate(results[1:], 2):
-                text = result.get('text', '')
+                text = result.text
                 if len(text) > 100:
                     text = text[:100] + "..."
-                answer += f"{i}. {text}\n"
+                parts.append(f"{i}. {text}\n")
         
-        return answer
+        return "".join(parts)
+    
+    def get_cache_stats(self):
+        """获取查询缓存命中统计"""
+        if not self.initialized:
+            self.initialize()
+        
+        return self.vector_store.get_cache_stats()
+    
+    def get_metrics(self) -> Dict[str, Any]:
+        """运行指标：各操作的调用次数与最近窗口内的延迟分位数（毫秒），以及查询缓存统计"""
+        with self._metrics_lock:
+            samples = {op: np.fromiter(latencies, dtype=np.int64) for op, latencies in self._latencies.items()}
+            call_counts = dict(self._call_counts)
+        operations = {}
+        for op, latencies in samples.items():
+            p50, p95 = np.quantile(latencies, [0.5, 0.95]) / 1e6
+            operations[op] = {
+                "calls": call_counts[op],
+                "p50_ms": round(float(p50), 3),
+                "p95_ms": round(float(p95), 3),
+                "max_ms": round(float(latencies.max()) / 1e6, 3)
+            }
+        return {
+            "operations": operations,
+            "cache": self.vector_store.get_cache_stats()
+        }
     
     def get_stats(self):
         """获取系统统计信息"""
@@ -100,6 +208,20 @@ class SimpleRAGSystem:
             self.initialize()
         
         return self.vector_store.get_collection_info()
+    
+    def iter_documents(self, fields=("text", "source")):
+        """遍历知识库中的全部文档"""
+        if not self.initialized:
+            self.initialize()
+        
+        return self.vector_store.iter_documents(fields)
+    
+    def count_by_source(self):
+        """按来源统计文档数"""
+        if not self.initialized:
+            self.initialize()
+        
+        return self.vector_store.count_by_source()
 
 def main():
     """主函数 - 测试 RAG 系统"""
@@ -165,23 +287,22 @@ def main():
             "Python 有什么特点？"
         ]
         
-        for query in test_queries:
+        # 所有测试查询一次批量检索
+        all_results = rag.batch_search(test_queries, top_k=2)
+        
+        for query, results in zip(test_queries, all_results):
             print(f"\n{'='*60}")
             print(f"查询: {query}")
             print(f"{'='*60}")
             
-            # 搜索相关文档
-            results = rag.search(query, top_k=2)
-            
             if results:
                 print(f"找到 {len(results)} 个相关结果:")
                 for i, result in enumerate(results, 1):
-                    score = result.get('score', 0)
-                    similarity = max(0, 1 - score)
+                    similarity = max(0, result.score)
                     print(f"\n结果 {i}:")
-                    print(f"  来源: {result.get('source', 'unknown')}")
+                    print(f"  来源: {result.source}")
                     print(f"  相似度: {similarity:.2%}")
-                    print(f"  内容: {result.get('text', '')[:120]}...")
+                    print(f"  内容: {result.text[:120]}...")
             else:
                 print("没有找到相关结果")
         
@@ -1,96 +1,156 @@
 # test_client_fixed_final.py
 import asyncio
+import statistics
 import sys
 import os
+import time
+from itertools import islice
 import mcp
 import mcp.client.stdio
 import mcp.client.session
+from contextlib import asynccontextmanager
 from mcp.client.stdio import StdioServerParameters
 
-async def test_with_proper_handling():
-    """使用正确的处理方式测试"""
-    print("\n使用正确的处理方式测试...")
+# 服务器脚本与本文件同目录，按文件位置解析，不依赖当前工作目录
+MCP_SERVER_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), "mcp_server.py"))
+
+@asynccontextmanager
+async def mcp_session():
+    """启动一次 MCP 服务器并返回已初始化的会话，所有测试共用这一个会话"""
+    params = StdioServerParameters(
+        command=sys.executable,
+        args=[MCP_SERVER_PATH]
+    )
     
+    async with mcp.client.stdio.stdio_client(params) as (read_stream, write_stream):
+        async with mcp.client.session.ClientSession(read_stream, write_stream) as session:
+            await session.initialize()
+            yield session
+
+def show_tools(tools_result):
+    """工具测试结果"""
+    if isinstance(tools_result, Exception):
+        print(f"❌ 工具测试失败: {tools_result}")
+    elif hasattr(tools_result, 'tools'):
+        print(f"✅ 工具: 找到 {len(tools_result.tools)} 个工具")
+        for tool in islice(tools_result.tools, 3):
+            print(f"   - {tool.name}: {tool.description}")
+    else:
+        print(f"⚠️  工具结果格式: {type(tools_result)}")
+
+def show_prompts(prompts_result):
+    """提示测试结果"""
+    if isinstance(prompts_result, Exception):
+        print(f"❌ 提示测试失败: {prompts_result}")
+    elif hasattr(prompts_result, 'prompts'):
+        print(f"✅ 提示: 找到 {len(prompts_result.prompts)} 个提示")
+        for prompt in prompts_result.prompts:
+            print(f"   - {prompt.name}: {prompt.description}")
+    else:
+        print(f"⚠️  提示结果格式: {type(prompts_result)}")
+
+def show_resources(resources_result):
+    """资源测试结果"""
+    if isinstance(resources_result, Exception):
+        print(f"❌ 资源测试失败: {resources_result}")
+    elif hasattr(resources_result, 'resources'):
+        print(f"✅ 资源: 找到 {len(resources_result.resources)} 个资源")
+        for resource in resources_result.resources:
+            print(f"   - {resource.name}: {resource.description}")
+    else:
+        print(f"⚠️  资源结果格式: {type(resources_result)}")
+
+async def test_listings(session):
+    """工具 / 提示 / 资源列表测试：三个请求互不依赖，并发发出，再按固定顺序输出"""
+    tools_result, prompts_result, resources_result = await asyncio.gather(
+        session.list_tools(),
+        session.list_prompts(),
+        session.list_resources(),
+        return_exceptions=True
+    )
+    show_tools(tools_result)
+    show_prompts(prompts_result)
+    show_resources(resources_result)
+
+async def test_call_tool(session):
+    """工具调用测试 - 正确处理CallToolResult"""
     try:
-        params = StdioServerParameters(
-            command=sys.executable,
-            args=[os.path.abspath("mcp_server.py")]
+        print("\n🔧 工具调用测试...")
+        call_result = await session.call_tool(
+            "search_knowledge",
+            {"query": "测试", "top_k": 1}
         )
         
-        async with mcp.client.stdio.stdio_client(params) as (read_stream, write_stream):
-            async with mcp.client.session.ClientSession(read_stream, write_stream) as session:
-                await session.initialize()
-                
-                print("\n=== 测试结果 ===")
-                
-                # 工具测试
-                try:
-                    tools_result = await session.list_tools()
-                    if hasattr(tools_result, 'tools'):
-                        print(f"✅ 工具: 找到 {len(tools_result.tools)} 个工具")
-                        for tool in tools_result.tools[:3]:
-                            print(f"   - {tool.name}: {tool.description}")
-                    else:
-                        print(f"⚠️  工具结果格式: {type(tools_result)}")
-                except Exception as e:
-                    print(f"❌ 工具测试失败: {e}")
-                
-                # 提示测试
-                try:
-                    prompts_result = await session.list_prompts()
-                    if hasattr(prompts_result, 'prompts'):
-                        print(f"✅ 提示: 找到 {len(prompts_result.prompts)} 个提示")
-                        for prompt in prompts_result.prompts:
-                            print(f"   - {prompt.name}: {prompt.description}")
-                    else:
-                        print(f"⚠️  提示结果格式: {type(prompts_result)}")
-                except Exception as e:
-                    print(f"❌ 提示测试失败: {e}")
-                
-                # 资源测试
-                try:
-                    resources_result = await session.list_resources()
-                    if hasattr(resources_result, 'resources'):
-                        print(f"✅ 资源: 找到 {len(resources_result.resources)} 个资源")
-                        for resource in resources_result.resources:
-                            print(f"   - {resource.name}: {resource.description}")
-                    else:
-                        print(f"⚠️  资源结果格式: {type(resources_result)}")
-                except Exception as e:
-                    print(f"❌ 资源测试失败: {e}")
-                
-                # 工具调用测试 - 正确处理CallToolResult
-                try:
-                    print("\n🔧 工具调用测试...")
-                    call_result = await session.call_tool(
-                        "search_knowledge",
-                        {"query": "测试", "top_k": 1}
-                    )
-                    
-                    # 根据API文档，CallToolResult有content属性（注意是单数）
-                    if hasattr(call_result, 'content'):
-                        content = call_result.content
-                        print(f"✅ 工具调用成功，返回 {len(content)} 个内容")
-                        
-                        if content:
-                            for item in content[:1]:
-                                if hasattr(item, 'text'):
-                                    text_preview = item.text[:100] + "..." if len(item.text) > 100 else item.text
-                                    print(f"   结果预览: {text_preview}")
-                                elif hasattr(item, 'type'):
-                                    print(f"   内容类型: {item.type}")
-                    else:
-                        print(f"⚠️  CallToolResult格式: {type(call_result)}")
-                        print(f"   实际属性: {[attr for attr in dir(call_result) if not attr.startswith('_')]}")
-                        if hasattr(call_result, '__dict__'):
-                            print(f"   实际数据: {call_result.__dict__}")
-                        
-                except Exception as e:
-                    print(f"❌ 工具调用失败: {e}")
-                    import traceback
-                    traceback.print_exc()
-                
-                return True
+        # 根据API文档，CallToolResult有content属性（注意是单数）
+        if hasattr(call_result, 'content'):
+            content = call_result.content
+            print(f"✅ 工具调用成功，返回 {len(content)} 个内容")
+            
+            if content:
+                for item in islice(content, 1):
+                    if hasattr(item, 'text'):
+                        text_preview = item.text[:100] + "..." if len(item.text) > 100 else item.text
+                        print(f"   结果预览: {text_preview}")
+                    elif hasattr(item, 'type'):
+                        print(f"   内容类型: {item.type}")
+        else:
+            print(f"⚠️  CallToolResult格式: {type(call_result)}")
+            print(f"   实际属性: {[attr for attr in dir(call_result) if not attr.startswith('_')]}")
+            if hasattr(call_result, '__dict__'):
+                print(f"   实际数据: {call_result.__dict__}")
+            
+    except Exception as e:
+        print(f"❌ 工具调用失败: {e}")
+        import traceback
+        traceback.print_exc()
+
+async def batch_call_tool(session, name, args_list, concurrency=16):
+    """并发调用同一个工具，返回每次调用的 (耗时秒数, 结果或异常)"""
+    semaphore = asyncio.Semaphore(concurrency)
+    
+    async def call_one(arguments):
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                result = await session.call_tool(name, arguments)
+            except Exception as e:
+                result = e
+            return time.perf_counter() - start, result
+    
+    return await asyncio.gather(*(call_one(arguments) for arguments in args_list))
+
+async def test_concurrent_calls(session, rounds=20):
+    """并发压测：少量查询重复多轮，重复的查询会命中服务端缓存"""
+    try:
+        print("\n⚡ 并发调用测试...")
+        queries = ["测试", "什么是 MCP？", "Milvus 是什么数据库？", "解释一下 RAG 技术", "向量嵌入是什么意思？"]
+        args_list = [{"query": query, "top_k": 3} for _ in range(rounds) for query in queries]
+        
+        start = time.perf_counter()
+        results = await batch_call_tool(session, "search_knowledge", args_list)
+        elapsed = time.perf_counter() - start
+        
+        latencies = [latency * 1000 for latency, _ in results]
+        failed = sum(1 for _, result in results if isinstance(result, Exception) or getattr(result, 'isError', False))
+        cuts = statistics.quantiles(latencies, n=20)
+        print(f"✅ {len(results)} 次调用完成，失败 {failed} 次，总耗时 {elapsed:.2f}s")
+        print(f"   延迟 p50: {cuts[9]:.1f}ms, p95: {cuts[18]:.1f}ms, 最大: {max(latencies):.1f}ms")
+    except Exception as e:
+        print(f"❌ 并发调用测试失败: {e}")
+
+async def test_with_proper_handling():
+    """使用正确的处理方式测试（只启动一次服务器，各项测试复用同一个会话）"""
+    print("\n使用正确的处理方式测试...")
+    
+    try:
+        async with mcp_session() as session:
+            print("\n=== 测试结果 ===")
+            
+            await test_listings(session)
+            await test_call_tool(session)
+            await test_concurrent_calls(session)
+            
+            return True
             
     except Exception as e:
         print(f"❌ 测试失败: {e}")